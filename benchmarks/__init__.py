@@ -0,0 +1,7 @@
+"""Mesures de performance : exports synthétiques, serveur OAI-PMH local et banc d'essai
+
+    python benchmarks/startup.py
+    python -m benchmarks.generate export.xml --arks 50000
+    python -m benchmarks.oai_stub --port 8765 --latency 0.05 --error-rate 0.02
+    python -m benchmarks.run --arks 50000 --compare benchmarks/results/precedent.json
+"""
@@ -0,0 +1,146 @@
+"""Exports Matomo XML synthétiques, à l'échelle voulue
+
+Même arborescence que les exports réels (<row>/<subtable> : "ark:" > NAAN >
+notices > composantes), avec les variantes rencontrées en production : suffixes
+.locale, vues v0001, notices sans URL (libellé seul) et ARK encodés dans le
+segment. Les identifiants ne dépendent que du rang de la notice : deux exports
+de même taille et de graines différentes décrivent les mêmes ARK (comme deux
+périodes successives), avec d'autres statistiques.
+
+    python -m benchmarks.generate export.xml --arks 50000 --components 2
+"""
+
+import sys
+import random
+import argparse
+
+BASE_URL = "https://bibliotheques-specialisees.paris.fr/ark:/73873/"
+NAAN = "73873"
+
+# Familles d'ARK (préfixe, poids) : surtout des notices bibliographiques
+ARK_FAMILIES = (("pf", 60), ("FRCGMNOV-", 15), ("FRCGMSUP-", 10), ("FRCGM-", 15))
+# Composantes : archives BAP/BHP/BHD, pages numérisées et vues A/B...
+COMPONENT_PREFIXES = ("BAP", "BHP", "BHD", "", "A", "B")
+
+
+def ark_id_for(index):
+    """Identifiant ARK (stable) de la notice de rang index"""
+    weight = index % 100
+    for prefix, share in ARK_FAMILIES:
+        if weight < share:
+            break
+        weight -= share
+    if prefix == "pf":
+        return f"pf{index:010d}"
+    return f"{prefix}{751000000 + index}-{index % 997:03d}"
+
+
+def component_id_for(rng, position):
+    """Identifiant de composante (position = rang dans la notice)"""
+    prefix = rng.choice(COMPONENT_PREFIXES)
+    if prefix == "":
+        return f"{position + 1:04d}"  # Page numérisée
+    if prefix in ("A", "B"):
+        return f"{prefix}{rng.randint(1000000, 9999999)}"
+    return f"{prefix}{rng.randint(1, 9999):04d}"
+
+
+def stats_xml(rng, visits):
+    """Compteurs Matomo d'une ligne (visites imposées, le reste en découle)"""
+    hits = visits + rng.randint(0, visits * 2)
+    time_spent = hits * rng.randint(5, 120)
+    parts = [f"<nb_visits>{visits}</nb_visits>"]
+    if rng.random() < 0.8:
+        parts.append(f"<nb_uniq_visitors>{max(1, visits - rng.randint(0, visits // 4 + 1))}</nb_uniq_visitors>")
+    else:  # Export multi-jours : visiteurs uniques cumulés
+        parts.append(f"<sum_daily_nb_uniq_visitors>{visits}</sum_daily_nb_uniq_visitors>")
+    parts.append(f"<nb_hits>{hits}</nb_hits><sum_time_spent>{time_spent}</sum_time_spent>")
+    if rng.random() < 0.5:
+        entries = rng.randint(0, visits)
+        parts.append(f"<entry_nb_visits>{entries}</entry_nb_visits>"
+                     f"<entry_bounce_count>{rng.randint(0, entries)}</entry_bounce_count>"
+                     f"<exit_nb_visits>{rng.randint(0, visits)}</exit_nb_visits>")
+    seconds = time_spent // max(hits, 1)
+    parts.append(f"<avg_time_on_page>{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}</avg_time_on_page>"
+                 f"<bounce_rate>{rng.randint(0, 100)} %</bounce_rate><exit_rate>{rng.randint(0, 100)} %</exit_rate>")
+    return "".join(parts)
+
+
+def segment_for(ark_id):
+    """Segment Matomo d'une page de l'ARK (pageUrl=@ark:/..., ARK doublement encodé)"""
+    return f"pageUrl%3D%40ark%253A%252F{NAAN}%252F{ark_id}"
+
+
+def generate_export(path, arks=10_000, components=2.0, locale_ratio=0.1, version_ratio=0.1,
+                    segment_ratio=0.05, seed=0):
+    """Écrit un export de arks notices ; renvoie le nombre de lignes <row> par sorte
+
+    components : nombre moyen de composantes par notice. locale_ratio,
+    version_ratio et segment_ratio : part des notices ayant aussi une ligne
+    .locale, une vue v0001 ou des lignes sans URL (ARK dans le segment).
+    """
+    rng = random.Random(seed)
+    counts = {"notices": 0, "variantes": 0, "composantes": 0, "segments": 0}
+    with open(path, "w", encoding="utf-8") as f:
+        write = f.write
+        write('<?xml version="1.0" encoding="utf-8" ?>\n<r>\n')
+        write(f"<row><label>ark:</label>{stats_xml(rng, arks)}<subtable>\n")
+        write(f"<row><label>{NAAN}</label>{stats_xml(rng, arks)}<subtable>\n")
+        for index in range(arks):
+            ark_id = ark_id_for(index)
+            url = BASE_URL + ark_id
+            # Visites en longue traîne : quelques notices très consultées
+            visits = max(1, int(rng.paretovariate(1.2)))
+            write(f"<row><label>/{ark_id}</label>{stats_xml(rng, visits)}<url>{url}</url>")
+            counts["notices"] += 1
+
+            count = int(rng.expovariate(1 / components)) if components > 0 else 0
+            if count:
+                write("<subtable>")
+                for position in range(count):
+                    comp_id = component_id_for(rng, position)
+                    write(f"<row><label>/{comp_id}</label>{stats_xml(rng, max(1, visits // 2))}"
+                          f"<url>{url}/{comp_id}</url></row>")
+                write("</subtable>")
+                counts["composantes"] += count
+            write("</row>\n")
+
+            if rng.random() < locale_ratio:
+                if rng.random() < 0.5:
+                    write(f"<row><label>/{ark_id}.locale=fr</label>{stats_xml(rng, 1)}"
+                          f"<url>{url}.locale=fr</url></row>\n")
+                else:  # Libellé seul, sans URL
+                    write(f"<row><label>{ark_id}.locale=en</label>{stats_xml(rng, 1)}</row>\n")
+                counts["variantes"] += 1
+            if rng.random() < version_ratio:
+                write(f"<row><label>/v0001.simple.selectedTab=record</label>{stats_xml(rng, 1)}"
+                      f"<url>{url}/v0001.simple.selectedTab=record?lang=fr</url></row>\n")
+                counts["variantes"] += 1
+            if rng.random() < segment_ratio:
+                segment = segment_for(ark_id)
+                write(f"<row><label>Autres</label><segment>{segment}</segment>{stats_xml(rng, 1)}</row>\n")
+                write(f"<row><label>/{rng.randint(1, 300):04d}</label><segment>{segment}</segment>"
+                      f"{stats_xml(rng, 1)}</row>\n")
+                counts["segments"] += 2
+        write("</subtable></row>\n</subtable></row>\n</r>\n")
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export Matomo XML synthétique")
+    parser.add_argument("output", help="Fichier XML à créer")
+    parser.add_argument("--arks", type=int, default=10_000, help="Nombre de notices ARK")
+    parser.add_argument("--components", type=float, default=2.0, help="Composantes par notice (moyenne)")
+    parser.add_argument("--locale", type=float, default=0.1, help="Part des notices avec une ligne .locale")
+    parser.add_argument("--versions", type=float, default=0.1, help="Part des notices avec une vue v0001")
+    parser.add_argument("--segments", type=float, default=0.05, help="Part des notices avec des lignes sans URL (segment)")
+    parser.add_argument("--seed", type=int, default=0, help="Graine (statistiques et variantes)")
+    args = parser.parse_args(argv)
+    counts = generate_export(args.output, args.arks, args.components, args.locale,
+                             args.versions, args.segments, args.seed)
+    print(", ".join(f"{value} {name}" for name, value in counts.items()), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""Serveur OAI-PMH local pour mesurer l'enrichissement sans solliciter le catalogue
+
+Répond à GetRecord et ListMetadataFormats comme l'endpoint réel : notices pf...
+en oai_dc (et oai_dc_syracuse pour une partie), fonds FRCGM... en inmedia,
+idDoesNotExist pour une part des ARK et cannotDisseminateFormat pour les autres
+formats. La latence (moyenne et gigue) et la part de réponses HTTP 503 sont
+réglables pour reproduire un catalogue lent ou instable.
+
+    python -m benchmarks.oai_stub --port 8765 --latency 0.05 --error-rate 0.02
+    python -m matomo_ark extract export.xml --endpoint http://127.0.0.1:8765/oai
+"""
+
+import sys
+import time
+import zlib
+import random
+import argparse
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+OAI_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>'
+              '<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">'
+              '<responseDate>2024-01-01T00:00:00Z</responseDate><request verb="{verb}">{url}</request>')
+OAI_FOOTER = '</OAI-PMH>'
+STUB_FORMATS = ("oai_dc_syracuse", "oai_dc", "inmedia")
+
+
+def dublin_core(ark_id):
+    """Notice oai_dc (titres, sujets et identifiants multiples, longue description)"""
+    return (
+        '<oai_dc:dc xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/" '
+        'xmlns:dc="http://purl.org/dc/elements/1.1/">'
+        f'<dc:title>Titre de la notice {ark_id}</dc:title><dc:title>Titre parallèle</dc:title>'
+        '<dc:creator>Hugo, Victor (1802-1885)</dc:creator><dc:date>1862</dc:date>'
+        '<dc:publisher>Paris : Lacroix</dc:publisher>'
+        f'<dc:description>{"Description détaillée de la notice. " * 12}</dc:description>'
+        '<dc:type>Texte imprimé</dc:type><dc:type>monographie</dc:type>'
+        '<dc:subject>Roman</dc:subject><dc:subject>Paris (France)</dc:subject>'
+        f'<dc:identifier>https://bibliotheques-specialisees.paris.fr/ark:/73873/{ark_id}</dc:identifier>'
+        f'<dc:identifier>COTE {ark_id[-6:]}</dc:identifier>'
+        '<dc:source>Bibliothèque historique de la Ville de Paris</dc:source>'
+        '<dc:language>fre</dc:language><dc:rights>Domaine public</dc:rights>'
+        '</oai_dc:dc>'
+    )
+
+
+def inmedia(ark_id):
+    """Notice inmedia (propriétés nommées)"""
+    properties = (("title", f"Fonds iconographique {ark_id}"), ("author", "Atget, Eugène"),
+                  ("date", "1900"), ("source", "Musée Carnavalet"), ("ark", ark_id))
+    return ('<inmedia:record xmlns:inmedia="http://www.inmedia.fr/">'
+            + "".join(f'<inmedia:property name="{name}">{value}</inmedia:property>' for name, value in properties)
+            + '</inmedia:record>')
+
+
+class StubOAIServer:
+    """Endpoint OAI-PMH local (thread d'arrière-plan), utilisable avec with
+
+    latency : délai moyen par réponse (s), jitter : écart maximal autour de la
+    moyenne, error_rate : part des requêtes en HTTP 503, absent_rate : part des
+    ARK inconnus du catalogue (toujours les mêmes, d'après leur identifiant).
+    """
+
+    def __init__(self, port=0, latency=0.0, jitter=0.0, error_rate=0.0, absent_rate=0.05, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.absent_rate = absent_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/oai"
+
+    def handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Connexions persistantes, comme l'endpoint réel
+            # En-têtes et corps partent en deux écritures : sans TCP_NODELAY, l'accusé
+            # de réception différé du client ajouterait ~40 ms à chaque réponse
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                status, body = stub.respond(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", "text/xml; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                if status == 503:
+                    self.send_header("Retry-After", "1")
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def delay(self):
+        """Latence simulée (tirée sous verrou : le générateur est partagé)"""
+        with self.lock:
+            self.requests += 1
+            delay = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+            failed = self.rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if delay > 0:
+            time.sleep(delay)
+        return failed
+
+    def is_absent(self, ark_id):
+        return zlib.crc32(ark_id.encode()) % 1000 < self.absent_rate * 1000
+
+    def respond(self, path):
+        """(statut HTTP, corps) de la réponse à une requête"""
+        query = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(path).query))
+        verb = query.get("verb", "")
+        if self.delay():
+            return 503, b"Service Unavailable"
+
+        parts = [OAI_HEADER.format(verb=verb, url="stub")]
+        if verb == "ListMetadataFormats":
+            parts.append("<ListMetadataFormats>")
+            parts.extend(f"<metadataFormat><metadataPrefix>{p}</metadataPrefix></metadataFormat>" for p in STUB_FORMATS)
+            parts.append("</ListMetadataFormats>")
+        elif verb == "GetRecord":
+            identifier = query.get("identifier", "")
+            prefix = query.get("metadataPrefix", "")
+            ark_id = identifier.rsplit("/", 1)[-1]
+            if self.is_absent(ark_id):
+                parts.append('<error code="idDoesNotExist">Identifiant inconnu</error>')
+            elif ark_id.startswith("FRCGM") and prefix == "inmedia":
+                metadata = inmedia(ark_id)
+            elif ark_id.startswith("pf") and (prefix == "oai_dc" or (prefix == "oai_dc_syracuse" and ark_id[-1] in "0123")):
+                metadata = dublin_core(ark_id)
+            else:
+                parts.append('<error code="cannotDisseminateFormat">Format non disponible</error>')
+            if len(parts) == 1:
+                parts.append(f"<GetRecord><record><header><identifier>{identifier}</identifier>"
+                             f"<datestamp>2024-01-01</datestamp></header>"
+                             f"<metadata>{metadata}</metadata></record></GetRecord>")
+        elif verb == "ListRecords":
+            parts.append('<error code="noRecordsMatch">Aucune notice</error>')
+        else:
+            parts.append('<error code="badVerb">Verbe inconnu</error>')
+        parts.append(OAI_FOOTER)
+        return 200, "".join(parts).encode("utf-8")
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur OAI-PMH local pour les mesures")
+    parser.add_argument("--port", type=int, default=8765, help="Port d'écoute (127.0.0.1)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Délai moyen par réponse (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Écart maximal autour du délai moyen (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Part des requêtes en HTTP 503")
+    parser.add_argument("--absent-rate", type=float, default=0.05, help="Part des ARK inconnus du catalogue")
+    args = parser.parse_args(argv)
+    server = StubOAIServer(args.port, args.latency, args.jitter, args.error_rate, args.absent_rate)
+    print(f"Endpoint OAI-PMH local: {server.url} (Ctrl+C pour arrêter)", file=sys.stderr)
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+        print(f"{server.requests} requêtes, {server.errors} erreurs simulées", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
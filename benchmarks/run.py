@@ -0,0 +1,233 @@
+"""Banc d'essai des étapes : lecture XML, réponses OAI-PMH, enrichissement et exports
+
+Un export synthétique (benchmarks.generate) est lu, enrichi sur un échantillon
+auprès du serveur OAI-PMH local (benchmarks.oai_stub), puis écrit dans chaque
+format. Pour chaque étape (mesurée comme une extraction, voir
+matomo_ark.profiling) : durée, temps CPU, lignes par seconde et pic de
+mémoire (RSS). Les résultats sont enregistrés en JSON pour être comparés d'une
+version à l'autre (--compare), une étape plus lente que le seuil faisant
+échouer la commande.
+
+    python -m benchmarks.run --arks 50000
+    python -m benchmarks.run --arks 50000 --compare benchmarks/results/20240301_120000.json
+    python -m benchmarks.run --input export.xml --formats xlsx --oai-sample 0
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+
+from matomo_ark.parsing import parse_xml, parse_many
+from matomo_ark.oai import parse_oai_response, enrich_notices
+from matomo_ark.exporters import EXPORTERS
+from matomo_ark.profiling import RunProfile, PROFILE_MODES
+
+from .generate import generate_export, ark_id_for
+from .oai_stub import StubOAIServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def oai_responses(count):
+    """Réponses GetRecord variées (oai_dc, inmedia, erreurs), produites par le serveur local"""
+    stub = StubOAIServer()
+    try:
+        responses = []
+        for i in range(count):
+            ark_id = ark_id_for(i)
+            prefix = "inmedia" if ark_id.startswith("FRCGM") else "oai_dc"
+            identifier = f"oai:bibliotheques-specialisees.paris.fr:ark:/73873/{ark_id}"
+            responses.append(stub.respond(f"/oai?verb=GetRecord&identifier={identifier}&metadataPrefix={prefix}")[1])
+        return responses
+    finally:
+        stub.server.server_close()
+
+
+def run_benchmark(args, workdir):
+    """Exécute les étapes ; renvoie (paramètres, mesures par étape)"""
+    profile = RunProfile(args.profile)
+
+    # Entrée : fichiers fournis ou exports synthétiques (un par graine)
+    if args.input:
+        xml_paths = args.input
+    else:
+        xml_paths = [os.path.join(workdir, f"export_{i + 1}.xml") for i in range(args.files)]
+        with profile.stage("generate") as stage:
+            rows = 0
+            for i, path in enumerate(xml_paths):
+                counts = generate_export(path, args.arks, args.components, args.locale,
+                                         args.versions, args.segments, seed=args.seed + i)
+                rows += sum(counts.values())
+            stage.rows = rows
+    input_mb = sum(os.path.getsize(p) for p in xml_paths) / 1024 / 1024
+
+    with profile.stage("parse") as stage:
+        if len(xml_paths) == 1:
+            notices, components = parse_xml(xml_paths[0])
+        else:
+            notices, components = parse_many(xml_paths, args.jobs)
+        stage.rows = len(notices) + len(components)
+        stage.extra["input_mb"] = round(input_mb, 1)
+    stage.extra["mb_per_s"] = round(input_mb / stage.wall_s, 1) if stage.wall_s else None
+
+    if args.oai_responses:
+        responses = oai_responses(args.oai_responses)
+        with profile.stage("parse_oai_response") as stage:
+            for body in responses:
+                parse_oai_response(body)
+            stage.rows = len(responses)
+
+    if args.oai_sample:
+        sample = notices[:args.oai_sample]
+        with StubOAIServer(latency=args.latency, jitter=args.latency / 2, error_rate=args.error_rate,
+                           seed=args.seed) as server:
+            with profile.stage("enrich") as stage:
+                stage.extra.update(enrich_notices(sample, components, base_url=server.url,
+                                                  max_workers=args.workers, requests_per_second=args.rate))
+                stage.rows = len(sample)
+            # Vu du serveur : toutes les requêtes reçues, dont les erreurs simulées
+            stage.extra["stub_requests"] = server.requests
+            stage.extra["stub_errors"] = server.errors
+            stage.extra["requests_per_s"] = round(server.requests / stage.wall_s, 1) if stage.wall_s else None
+
+    for name in args.formats:
+        exporter = EXPORTERS[name]
+        output_path = os.path.join(workdir, f"bench{exporter.extension}")
+        try:
+            with profile.stage(f"export_{name}") as stage:
+                paths = exporter.write(notices, components, output_path, source_name="benchmark")
+                stage.rows = len(notices) + len(components)
+        except RuntimeError as e:  # Dépendance facultative absente (pyarrow)
+            print(f"export_{name} ignoré: {e}", file=sys.stderr)
+            profile.stages.pop(f"export_{name}", None)
+            continue
+        stage.extra["output_mb"] = round(sum(os.path.getsize(p) for p in paths) / 1024 / 1024, 1)
+
+    params = {
+        "input": [os.path.basename(p) for p in xml_paths] if args.input else None,
+        "arks": None if args.input else args.arks,
+        "components": None if args.input else args.components,
+        "files": len(xml_paths),
+        "jobs": args.jobs,
+        "locale": args.locale, "versions": args.versions, "segments": args.segments, "seed": args.seed,
+        "oai_sample": args.oai_sample, "oai_responses": args.oai_responses,
+        "latency": args.latency, "error_rate": args.error_rate, "workers": args.workers, "rate": args.rate,
+        "formats": list(args.formats), "profile": args.profile,
+        "notices": len(notices), "composantes": len(components),
+    }
+    return params, {name: stage.to_dict() for name, stage in profile.stages.items()}
+
+
+def print_stages(stages):
+    print(f"{'étape':<20} {'durée s':>9} {'CPU s':>9} {'lignes':>10} {'lignes/s':>11} {'pic RSS Mo':>11}")
+    for name, s in stages.items():
+        rate = f"{s['rows_per_s']:,.0f}".replace(",", " ") if s.get("rows_per_s") else "-"
+        peak = f"{s['peak_rss_mb']:.0f}" if s.get("peak_rss_mb") is not None else "-"
+        print(f"{name:<20} {s['wall_s']:9.2f} {s['cpu_s']:9.2f} {s.get('rows', 0):10d} {rate:>11} {peak:>11}")
+
+
+def compare(previous, stages, threshold):
+    """Écarts avec des résultats précédents ; renvoie les étapes plus lentes que le seuil"""
+    print(f"\nComparaison avec {previous.get('date')} ({previous.get('commit') or '?'}) :")
+    regressions = []
+    for name, s in stages.items():
+        old = previous["stages"].get(name)
+        if not old or not old.get("wall_s"):
+            continue
+        change = (s["wall_s"] - old["wall_s"]) / old["wall_s"]
+        flag = ""
+        # Les étapes très courtes sont trop bruitées pour conclure
+        if change > threshold and s["wall_s"] - old["wall_s"] > 0.05:
+            flag = "  <- plus lent"
+            regressions.append(name)
+        memory = ""
+        if s.get("peak_rss_mb") and old.get("peak_rss_mb"):
+            memory = f"  mémoire {old['peak_rss_mb']:.0f} -> {s['peak_rss_mb']:.0f} Mo"
+        print(f"  {name:<20} {old['wall_s']:8.2f} s -> {s['wall_s']:8.2f} s ({change:+.0%}){memory}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai des étapes d'extraction")
+    source = parser.add_argument_group("Entrée")
+    source.add_argument("--input", nargs="+", help="Exports XML réels (au lieu d'exports synthétiques)")
+    source.add_argument("--arks", type=int, default=20_000, help="Notices par export synthétique")
+    source.add_argument("--components", type=float, default=2.0, help="Composantes par notice (moyenne)")
+    source.add_argument("--locale", type=float, default=0.1, help="Part des notices avec une ligne .locale")
+    source.add_argument("--versions", type=float, default=0.1, help="Part des notices avec une vue v0001")
+    source.add_argument("--segments", type=float, default=0.05, help="Part des notices avec des lignes sans URL")
+    source.add_argument("--files", type=int, default=1, help="Exports synthétiques (lus en parallèle s'il y en a plusieurs)")
+    source.add_argument("-j", "--jobs", type=int, help="Processus de lecture pour plusieurs fichiers")
+    source.add_argument("--seed", type=int, default=0, help="Graine des exports et du serveur")
+    oai = parser.add_argument_group("OAI-PMH (serveur local)")
+    oai.add_argument("--oai-responses", type=int, default=2000, help="Réponses GetRecord analysées (0 : étape ignorée)")
+    oai.add_argument("--oai-sample", type=int, default=300, help="Notices enrichies (0 : étape ignorée)")
+    oai.add_argument("--latency", type=float, default=0.02, help="Délai moyen du serveur (s)")
+    oai.add_argument("--error-rate", type=float, default=0.01, help="Part des réponses HTTP 503")
+    oai.add_argument("--workers", type=int, default=4, help="Requêtes simultanées")
+    oai.add_argument("--rate", type=float, default=1000.0, help="Débit maximal (requêtes/s)")
+    output = parser.add_argument_group("Sorties et résultats")
+    output.add_argument("-f", "--formats", nargs="+", choices=list(EXPORTERS), default=list(EXPORTERS),
+                        help="Formats exportés (par défaut: tous)")
+    output.add_argument("--label", help="Nom ajouté au fichier de résultats")
+    output.add_argument("--save", help=f"Fichier de résultats (par défaut: horodaté dans {os.path.relpath(RESULTS_DIR, ROOT)})")
+    output.add_argument("--no-save", action="store_true", help="Ne pas enregistrer les résultats")
+    output.add_argument("--compare", help="Résultats précédents (JSON) à comparer")
+    output.add_argument("--threshold", type=float, default=0.10, help="Ralentissement toléré par étape (0.10 = 10 %%)")
+    output.add_argument("--keep", help="Dossier où conserver exports et fichiers générés")
+    output.add_argument("--profile", choices=PROFILE_MODES,
+                        help="Profiler chaque étape (fonctions ou allocations les plus coûteuses dans le JSON)")
+    args = parser.parse_args(argv)
+
+    if args.keep:
+        os.makedirs(args.keep, exist_ok=True)
+        params, stages = run_benchmark(args, args.keep)
+    else:
+        with tempfile.TemporaryDirectory(prefix="matomo_ark_bench_") as workdir:
+            params, stages = run_benchmark(args, workdir)
+
+    print_stages(stages)
+    results = {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "label": args.label,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": params,
+        "stages": stages,
+    }
+    if not args.no_save:
+        path = args.save or os.path.join(
+            RESULTS_DIR, time.strftime("%Y%m%d_%H%M%S") + (f"_{args.label}" if args.label else "") + ".json")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\nRésultats: {path}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        if previous.get("params", {}).get("notices") != params["notices"]:
+            print("Attention : les entrées diffèrent, la comparaison est indicative", file=sys.stderr)
+        if compare(previous, stages, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Temps de démarrage : imports de l'application et du cœur
+
+Chaque mesure lance un interpréteur neuf (python -X importtime) et relève le
+temps d'import cumulé de chaque cible. Les modules lourds (openpyxl, pandas,
+pile réseau, pools de processus) ne doivent être chargés qu'à l'étape qui s'en
+sert : leur présence au démarrage est signalée et fait échouer le script.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 10 --save benchmarks/results/startup.json
+    python benchmarks/startup.py --window   # jusqu'à la première fenêtre (écran requis)
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cibles mesurées : l'application (customtkinter requis), le cœur et la ligne de commande
+TARGETS = ("app", "matomo_ark", "matomo_ark.cli")
+
+# Modules qui ne doivent pas être chargés au démarrage
+LAZY_MODULES = ("openpyxl", "pandas", "numpy", "pyarrow", "ssl", "http.client",
+                "concurrent.futures", "multiprocessing")
+
+# Affiche les modules chargés (sortie standard), après les mesures d'import (sortie d'erreur)
+PROBE = "import {target}, sys; print(' '.join(sys.modules))"
+WINDOW_PROBE = """
+import time; start = time.perf_counter()
+import app
+app.ctk.set_appearance_mode("dark")
+window = app.MatomoARKExtractor()
+window.update()
+print(f"{(time.perf_counter() - start) * 1000:.1f}")
+window.destroy()
+"""
+
+
+def parse_importtime(stderr):
+    """Lignes "import time: self | cumulé | module" -> {module: (self µs, cumulé µs)}"""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def measure_import(target):
+    """Un import à froid : (durée du processus en ms, temps par module, modules chargés)"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(target=target)],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return wall_ms, parse_importtime(result.stderr), set(result.stdout.split())
+
+
+def measure_window():
+    """Durée jusqu'à l'affichage de la fenêtre principale, en ms"""
+    result = subprocess.run([sys.executable, "-c", WINDOW_PROBE], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return float(result.stdout.strip())
+
+
+def bench_target(target, runs, top):
+    """Mesures répétées d'une cible : médiane, minimum et modules les plus coûteux"""
+    import_ms, wall_ms = [], []
+    for _ in range(runs):
+        wall, times, loaded = measure_import(target)
+        import_ms.append(times[target][1] / 1000)
+        wall_ms.append(wall)
+    # Modules les plus coûteux (temps cumulé, dernière mesure)
+    costly = sorted(((cumulative / 1000, name) for name, (_, cumulative) in times.items() if name != target),
+                    reverse=True)[:top]
+    return {
+        "import_ms_median": round(statistics.median(import_ms), 1),
+        "import_ms_min": round(min(import_ms), 1),
+        "process_ms_median": round(statistics.median(wall_ms), 1),
+        "modules": len(loaded),
+        "lazy_loaded": sorted(m for m in LAZY_MODULES if m in loaded),
+        "top": [{"module": name, "ms": round(ms, 1)} for ms, name in costly],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Temps d'import à froid de l'application")
+    parser.add_argument("--runs", type=int, default=5, help="Mesures par cible (médiane)")
+    parser.add_argument("--top", type=int, default=8, help="Modules les plus coûteux affichés")
+    parser.add_argument("--window", action="store_true", help="Mesurer aussi l'affichage de la fenêtre")
+    parser.add_argument("--save", help="Fichier JSON des résultats")
+    args = parser.parse_args(argv)
+
+    results = {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": args.runs,
+        "targets": {},
+    }
+    failed = False
+    for target in TARGETS:
+        try:
+            result = bench_target(target, args.runs, args.top)
+        except RuntimeError as e:
+            print(f"{target:<16} ignoré ({e})")
+            continue
+        results["targets"][target] = result
+        print(f"{target:<16} import {result['import_ms_median']:7.1f} ms (min {result['import_ms_min']:.1f})"
+              f"  processus {result['process_ms_median']:7.1f} ms  {result['modules']} modules")
+        for item in result["top"]:
+            print(f"    {item['ms']:7.1f} ms  {item['module']}")
+        if result["lazy_loaded"]:
+            print(f"    chargés trop tôt: {', '.join(result['lazy_loaded'])}")
+            failed = True
+
+    if args.window:
+        try:
+            results["window_ms"] = measure_window()
+            print(f"{'fenêtre':<16} affichée en {results['window_ms']:.1f} ms")
+        except RuntimeError as e:
+            print(f"{'fenêtre':<16} ignorée ({e})")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Résultats: {args.save}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+"""
+Matomo ARK Extractor - cœur de l'application, sans interface graphique
+
+Lecture des exports Matomo XML, enrichissement OAI-PMH et export Excel,
+utilisables depuis l'application (app.py) ou en ligne de commande :
+
+    python -m matomo_ark extract export.xml --no-metadata -o stats.xlsx
+"""
+
+__version__ = "2.1.19"
+
+from .parsing import MatomoStats, Notice, Component, parse_xml, parse_many
+from .classify import get_type_from_ark
+from .oai import OAICache, harvest_oai_records, enrich_notices
+from .pipeline import ExtractionPipeline, default_output_path
+from .exporters import EXPORTERS
+
+__all__ = [
+    "MatomoStats", "Notice", "Component", "parse_xml", "parse_many", "get_type_from_ark",
+    "OAICache", "harvest_oai_records", "enrich_notices",
+    "generate_excel", "EXPORTERS", "ExtractionPipeline", "default_output_path",
+]
+
+
+def __getattr__(name):
+    # openpyxl (lent à importer) n'est chargé qu'à la première utilisation
+    if name == "generate_excel":
+        from .export import generate_excel
+        return generate_excel
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
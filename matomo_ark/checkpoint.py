@@ -0,0 +1,99 @@
+"""Journal de reprise de l'enrichissement OAI-PMH (SQLite)
+
+Chaque réponse obtenue pour une notice (métadonnées, notice absente, format
+indisponible) est notée au fil de l'enrichissement, sous l'empreinte du
+contenu des fichiers lus et l'ARK. Une extraction interrompue (annulation,
+plantage, coupure réseau) et relancée sur les mêmes fichiers reprend ces
+réponses sans requête et ne demande que les notices restantes. Le journal
+d'un fichier est effacé une fois ses sorties écrites.
+"""
+
+import os
+import json
+import time
+import sqlite3
+
+from .oai import get_app_dir
+
+CHECKPOINT_FILENAME = "reprise_enrichissement.sqlite3"
+CHECKPOINT_MAX_AGE_DAYS = 14  # Journaux d'extractions jamais relancées supprimés au-delà
+CHECKPOINT_COMMIT_SECONDS = 1.0  # Au plus une seconde de réponses perdue en cas d'arrêt brutal
+
+
+class EnrichmentJournal:
+    """Réponses OAI-PMH déjà obtenues pour un jeu de fichiers, par ARK
+
+    input_key : empreinte du contenu des fichiers lus (ParseCache.fingerprint).
+    Les écritures sont validées au plus toutes les CHECKPOINT_COMMIT_SECONDS
+    secondes, et à la fermeture.
+    Seules les réponses définitives sont notées (titre trouvé, notice absente) :
+    une erreur peut venir d'un format essayé faute de réponse sur le bon.
+    Une annulation (cancel de enrich_notices) abandonne les requêtes en attente ;
+    les réponses déjà obtenues restent sur les notices et dans le journal.
+    """
+
+    def __init__(self, input_key, path=None, source=None, max_age_days=CHECKPOINT_MAX_AGE_DAYS):
+        self.input_key = input_key
+        self.path = path or os.path.join(get_app_dir(), CHECKPOINT_FILENAME)
+        self.committed = time.monotonic()
+
+        # Écrit depuis le thread d'enrichissement en mode pipelined
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS runs (
+                input_key TEXT PRIMARY KEY,
+                source TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                input_key TEXT NOT NULL,
+                ark TEXT NOT NULL,
+                status TEXT NOT NULL,
+                prefix TEXT,
+                metadata TEXT,
+                PRIMARY KEY (input_key, ark)
+            ) WITHOUT ROWID
+        """)
+        expired = time.time() - max_age_days * 86400
+        self.conn.execute("DELETE FROM entries WHERE input_key IN (SELECT input_key FROM runs WHERE updated_at < ?)",
+                          (expired,))
+        self.conn.execute("DELETE FROM runs WHERE updated_at < ?", (expired,))
+        self.conn.execute("INSERT INTO runs VALUES (?, ?, ?) ON CONFLICT (input_key) DO UPDATE SET updated_at = ?",
+                          (input_key, source, time.time(), time.time()))
+        self.conn.commit()
+
+    def load(self):
+        """Réponses notées {ark: (statut, format retenu, métadonnées)}"""
+        return {
+            ark: (status, prefix, json.loads(metadata) if metadata else None)
+            for ark, status, prefix, metadata in self.conn.execute(
+                "SELECT ark, status, prefix, metadata FROM entries WHERE input_key = ?", (self.input_key,)
+            )
+        }
+
+    def put(self, ark, status, prefix, metadata):
+        """Note la réponse obtenue pour un ARK"""
+        payload = json.dumps(metadata, ensure_ascii=False) if metadata else None
+        self.conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                          (self.input_key, ark, status, prefix, payload))
+        if time.monotonic() - self.committed >= CHECKPOINT_COMMIT_SECONDS:
+            self.commit()
+
+    def commit(self):
+        self.conn.execute("UPDATE runs SET updated_at = ? WHERE input_key = ?", (time.time(), self.input_key))
+        self.conn.commit()
+        self.committed = time.monotonic()
+
+    def clear(self):
+        """Efface le journal de ces fichiers (extraction menée à son terme)"""
+        self.conn.execute("DELETE FROM entries WHERE input_key = ?", (self.input_key,))
+        self.conn.execute("DELETE FROM runs WHERE input_key = ?", (self.input_key,))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
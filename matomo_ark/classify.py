@@ -0,0 +1,162 @@
+"""Classement des ARK : identifiants, composantes et types en un seul appel
+
+Les règles sont des données (tables préfixe -> type, préfixes de composantes),
+compilées au chargement en une expression régulière par table : le préfixe le
+plus long l'emporte, en un seul appel. Chaque ARK n'est analysé qu'une fois
+(identifiant sans .locale, NAAN, type de notice, URL de la notice) : les lignes
+suivantes du même ARK (composantes, vues, variantes de langue) réutilisent ce
+résultat mémorisé.
+"""
+
+import re
+import sys
+from dataclasses import dataclass
+from functools import lru_cache
+
+SITE_URL = "https://bibliotheques-specialisees.paris.fr/"
+UNKNOWN_PARENT_ARK = "ark:/73873/inconnu"  # Composante dont la notice n'est pas identifiable
+CLASSIFY_CACHE_SIZE = 1 << 17  # ARK, segments et libellés mémorisés (chacun)
+
+# Familles d'ARK : préfixe de l'identifiant -> type de ressource
+ARK_TYPE_RULES = {
+    'FRCGMNOV': 'Fonds iconographique - Nouvelles',
+    'FRCGMSUP': 'Fonds iconographique - Suppléments',
+    'FRCGM': 'Fonds iconographique',
+    'pf': 'Notice bibliographique',
+}
+ARK_TYPE_DEFAULT = 'Autre'
+
+# Composantes : préfixe de l'identifiant -> type (les identifiants numériques sont des pages)
+COMPONENT_TYPE_RULES = {
+    'BAP': 'Archive (BAP)',
+    'BHP': 'Archive (BHP)',
+    'BMD': 'Archive (BMD)',
+}
+COMPONENT_TYPE_PAGE = 'Page numérisée'
+COMPONENT_TYPE_DEFAULT = 'Autre'
+
+# Identifiants reconnus comme composantes (en plus des pages "0001") :
+# après l'ARK dans une URL (.../pf123/BAP0001, .../pf123/A2194500)...
+URL_COMPONENT_PREFIXES = ('BAP', 'BHP', 'BHD', 'A', 'B')
+# ... et dans un libellé de ligne (/BAP0001), dont la notice vient du segment
+LABEL_COMPONENT_PREFIXES = ('BAP', 'BHP', 'BHD')
+# Libellés de notices sans URL (pf..., FRCGM...) et libellés de regroupement ignorés
+LABEL_NOTICE_PREFIXES = ('pf', 'FRCGM')
+LABEL_IGNORED = frozenset(('ark:', '73873', 'Autres'))
+
+PAGE_ID_PATTERN = r'\d{4}$'  # Page numérisée "0001"
+
+URL_ARK_PATTERN = re.compile(r'ark:/(\d+)/([a-zA-Z0-9\-_\.]+)(?:/([a-zA-Z0-9\-_\.]+))?')
+SEGMENT_ARK_PATTERN = re.compile(r'ark%253A%252F(\d+)%252F([a-zA-Z0-9\-]+)')
+LOCALE_SUFFIX_PATTERN = re.compile(r'\.locale(=.*)?$')
+# URL de notice : sans vue (/v0001.simple...) ni paramètres (?lang=fr), le premier des deux coupant
+URL_SUFFIX_PATTERN = re.compile(r'(?:/v\d+\.|\?).*$')
+
+
+def prefix_pattern(prefixes, *patterns):
+    """Expression compilée reconnaissant l'un des préfixes (le plus long d'abord) ou des motifs"""
+    alternatives = [re.escape(prefix) for prefix in sorted(prefixes, key=len, reverse=True)]
+    return re.compile('|'.join(alternatives + list(patterns)))
+
+
+class PrefixTable:
+    """Table préfixe -> valeur, consultée par préfixe le plus long en un appel (match)"""
+
+    def __init__(self, rules, default=None):
+        self.rules = dict(rules)
+        self.default = default
+        self.pattern = prefix_pattern(self.rules)
+
+    def lookup(self, value):
+        match = self.pattern.match(value)
+        return self.rules[match.group()] if match else self.default
+
+
+ARK_TYPES = PrefixTable(ARK_TYPE_RULES, ARK_TYPE_DEFAULT)
+COMPONENT_TYPES = PrefixTable(COMPONENT_TYPE_RULES)
+URL_COMPONENT_PATTERN = prefix_pattern(URL_COMPONENT_PREFIXES, PAGE_ID_PATTERN)
+LABEL_COMPONENT_PATTERN = prefix_pattern(LABEL_COMPONENT_PREFIXES, PAGE_ID_PATTERN)
+LABEL_NOTICE_PATTERN = prefix_pattern(LABEL_NOTICE_PREFIXES)
+
+
+def get_type_from_ark(ark_id):
+    """Détermine le type de ressource (famille d'ARK) depuis l'identifiant ARK"""
+    return ARK_TYPES.lookup(ark_id)
+
+
+def component_type(comp_id):
+    """Type de composante d'après son identifiant (BAP..., pages numérisées)"""
+    found = COMPONENT_TYPES.lookup(comp_id)
+    if found is not None:
+        return found
+    return COMPONENT_TYPE_PAGE if comp_id.isdigit() else COMPONENT_TYPE_DEFAULT
+
+
+@dataclass(slots=True)
+class ArkInfo:
+    """Résultat du classement d'une ligne : notice ARK et, le cas échéant, composante
+
+    Les résultats mémorisés sont partagés entre les lignes : ne pas les modifier.
+    """
+    ark: str  # ARK complet de la notice (ark:/73873/pf...)
+    naan: str
+    ark_id: str
+    notice_type: str
+    url: str  # URL de la notice, sans vue ni paramètres
+    component_id: str | None = None
+    component_type: str | None = None
+
+
+@lru_cache(maxsize=CLASSIFY_CACHE_SIZE)
+def classify_ark(naan, ark_id_raw):
+    """Notice d'un ARK (suffixe .locale retiré), avec l'URL du site pour adresse"""
+    ark_id = LOCALE_SUFFIX_PATTERN.sub('', ark_id_raw)
+    ark = sys.intern(f"ark:/{naan}/{ark_id}")
+    return ArkInfo(ark, sys.intern(naan), ark_id, get_type_from_ark(ark_id), SITE_URL + ark)
+
+
+def classify_url(url):
+    """ARK d'une URL (.../ark:/73873/pf123.locale=fr, .../pf123/BAP0001, .../pf123/v0001...), ou None
+
+    Pour une composante, l'URL retenue est celle de la notice ; sinon l'URL
+    de la ligne sans vue (v0001...) ni paramètres.
+    Non mémorisée, contrairement aux fonctions voisines : Matomo agrège ses
+    lignes par URL, chaque URL n'apparaît qu'une fois par export et seul
+    l'ARK (classify_ark) se répète ; les relectures passent par ParseCache.
+    """
+    match = URL_ARK_PATTERN.search(url)
+    if match is None:
+        return None
+    naan, ark_id_raw, component_id = match.groups()
+    notice = classify_ark(naan, ark_id_raw)
+    if component_id is not None and URL_COMPONENT_PATTERN.match(component_id):
+        return ArkInfo(notice.ark, notice.naan, notice.ark_id, notice.notice_type, notice.url,
+                       component_id, component_type(component_id))
+    # Notice (y compris ses vues v0001/selectedTab, agrégées par ARK)
+    clean_url = URL_SUFFIX_PATTERN.sub('', url)
+    if clean_url == notice.url:
+        return notice
+    return ArkInfo(notice.ark, notice.naan, notice.ark_id, notice.notice_type, clean_url)
+
+
+@lru_cache(maxsize=CLASSIFY_CACHE_SIZE)
+def classify_segment(segment):
+    """ARK encodé dans un segment Matomo (pageUrl=@ark%253A%252F...), ou None"""
+    match = SEGMENT_ARK_PATTERN.search(segment)
+    if match is None:
+        return None
+    naan, ark_id = match.groups()
+    return classify_ark(naan, ark_id)
+
+
+@lru_cache(maxsize=CLASSIFY_CACHE_SIZE)
+def classify_label(label):
+    """Notice désignée par un libellé sans URL (pf123.locale=fr, FRCGM...), ou None"""
+    if label in LABEL_IGNORED or not LABEL_NOTICE_PATTERN.match(label):
+        return None
+    return classify_ark('73873', label)
+
+
+def is_label_component(comp_id):
+    """Composante désignée par un libellé (/BAP0001, /0001), sans le "/" initial"""
+    return LABEL_COMPONENT_PATTERN.match(comp_id) is not None
@@ -0,0 +1,216 @@
+"""Ligne de commande : extraction et moissonnage sans interface graphique
+
+    python -m matomo_ark extract export.xml --no-metadata -o stats.xlsx
+    python -m matomo_ark extract export.xml -f csv -f sqlite -o stats
+    python -m matomo_ark extract export.xml --report --profile cprofile
+    python -m matomo_ark harvest --from 2024-01-01
+    python -m matomo_ark history ingest export_2024-03.xml
+    python -m matomo_ark history ytd --until 2024-06 --top 20
+"""
+
+import os
+import sys
+import argparse
+from datetime import datetime
+
+from . import __version__
+from .pipeline import ExtractionPipeline, format_log_message
+from .exporters import EXPORTERS, DEFAULT_FORMATS
+from .parsing import parse_xml, parse_many
+from .history import PeriodStore, period_from_filename
+from .profiling import PROFILE_MODES
+from .oai import (
+    OAI_BASE_URL, OAI_MAX_WORKERS, OAI_REQUESTS_PER_SECOND, OAI_HARVEST_PREFIX,
+    OAICache, harvest_oai_records,
+)
+
+
+def make_logger(quiet=False):
+    """Journal sur la sortie d'erreur (la sortie standard reste libre pour les scripts)"""
+    def log(message, level="INFO"):
+        if quiet and level not in ("WARNING", "ERROR"):
+            return
+        print(format_log_message(message, level), file=sys.stderr, flush=True)
+    return log
+
+
+def make_progress(enabled):
+    """Avancement sur une seule ligne, seulement dans un terminal"""
+    def progress(value, text):
+        if enabled:
+            print(f"\r{value:4.0%} {text[:70]:<70}", end="\n" if value >= 1 else "", file=sys.stderr, flush=True)
+    return progress
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="matomo_ark",
+        description="Extraction des statistiques ARK depuis les exports Matomo XML"
+    )
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    extract = commands.add_parser("extract", help="Export XML Matomo -> Excel, CSV, Parquet ou SQLite")
+    extract.add_argument("xml_paths", nargs="+", help="Fichier(s) XML exporté(s) depuis Matomo, fusionnés s'il y en a plusieurs")
+    extract.add_argument("-o", "--output", help="Fichier à créer, l'extension suit le format (par défaut: horodaté, à côté du XML)")
+    extract.add_argument("-f", "--format", dest="formats", action="append", choices=list(EXPORTERS),
+                         help=f"Format de sortie, répétable (par défaut: {', '.join(DEFAULT_FORMATS)})")
+    extract.add_argument("--no-metadata", action="store_true", help="Ne pas interroger l'API OAI-PMH")
+    extract.add_argument("--no-cache", action="store_true", help="Ignorer les réponses OAI-PMH en cache")
+    extract.add_argument("--harvest", action="store_true", help="Moissonner le catalogue (ListRecords) avant l'extraction")
+    extract.add_argument("--workers", type=int, default=OAI_MAX_WORKERS, help="Requêtes OAI-PMH simultanées")
+    extract.add_argument("--rate", type=float, default=OAI_REQUESTS_PER_SECOND, help="Débit maximal (requêtes/s)")
+    extract.add_argument("--endpoint", default=OAI_BASE_URL, help="URL de l'API OAI-PMH")
+    extract.add_argument("--coverage", type=float,
+                         help="Demander au catalogue les notices les plus consultées jusqu'à couvrir "
+                              "cette part des visites (0.95 = 95 %%), les autres depuis le cache")
+    extract.add_argument("--top", type=int, help="Demander au catalogue les N notices les plus consultées seulement")
+    extract.add_argument("--max-requests", type=int, help="Nombre maximal de requêtes OAI-PMH")
+    extract.add_argument("--time-budget", type=float, help="Durée maximale des requêtes OAI-PMH (s)")
+    extract.add_argument("--period", help="Ajouter aussi les statistiques à l'historique pour cette période "
+                                          "(AAAA-MM, AAAA-MM-JJ, ou 'auto' : déduite du nom du fichier)")
+    extract.add_argument("-j", "--jobs", type=int, help="Processus de lecture pour plusieurs fichiers (par défaut: un par cœur)")
+    extract.add_argument("--pipeline", action="store_true",
+                         help="Demander les métadonnées pendant la lecture du XML (une seule étape mesurée) ; "
+                              "les exports, tous formats confondus (CSV et SQLite compris), restent écrits "
+                              "une fois lecture et enrichissement terminés")
+    extract.add_argument("--no-resume", action="store_true",
+                         help="Sans journal de reprise : ni reprise d'une extraction interrompue, ni avancement noté")
+    extract.add_argument("--no-parse-cache", action="store_true",
+                         help="Relire les fichiers XML même si leur lecture est en cache")
+    extract.add_argument("--report", action="store_true", help="Écrire le rapport de performance (nom_rapport.json)")
+    extract.add_argument("--report-sheet", action="store_true", help="Ajouter la feuille Performances au classeur Excel")
+    extract.add_argument("--profile", choices=PROFILE_MODES,
+                         help="Profiler chaque étape (cprofile : fonctions, avec nom_profil.prof ; "
+                              "tracemalloc : allocations) ; implique --report")
+    extract.add_argument("-q", "--quiet", action="store_true", help="N'afficher que les avertissements et erreurs")
+
+    harvest = commands.add_parser("harvest", help="Moissonner le catalogue dans le cache local")
+    harvest.add_argument("--prefix", default=OAI_HARVEST_PREFIX, help="Format moissonné")
+    harvest.add_argument("--from", dest="from_date", help="Date de début (AAAA-MM-JJ) ; par défaut la dernière moisson")
+    harvest.add_argument("--until", dest="until_date", help="Date de fin (AAAA-MM-JJ)")
+    harvest.add_argument("--endpoint", default=OAI_BASE_URL, help="URL de l'API OAI-PMH")
+    harvest.add_argument("-q", "--quiet", action="store_true", help="N'afficher que les avertissements et erreurs")
+
+    history = commands.add_parser("history", help="Historique multi-périodes des statistiques")
+    history.add_argument("--db", help="Base d'historique (par défaut: à côté de l'application)")
+    history_commands = history.add_subparsers(dest="history_command", required=True)
+
+    ingest = history_commands.add_parser("ingest", help="Ajouter (ou remplacer) des périodes")
+    ingest.add_argument("xml_paths", nargs="+", help="Exports XML Matomo (ceux d'une même période sont fusionnés)")
+    ingest.add_argument("--period", help="Période (AAAA-MM ou AAAA-MM-JJ) ; par défaut déduite du nom de chaque fichier")
+    ingest.add_argument("-j", "--jobs", type=int, help="Processus de lecture (par défaut: un par cœur)")
+    ingest.add_argument("-q", "--quiet", action="store_true", help="N'afficher que les avertissements et erreurs")
+
+    history_commands.add_parser("periods", help="Lister les périodes enregistrées")
+
+    trend = history_commands.add_parser("trend", help="Évolution d'un ARK période par période")
+    trend.add_argument("ark", help="ARK complet ou ID ARK (pf..., FRCGM...)")
+    trend.add_argument("--from", dest="start", help="Première période")
+    trend.add_argument("--until", dest="end", help="Dernière période")
+
+    ytd = history_commands.add_parser("ytd", help="Cumuls par ARK depuis le début de l'année")
+    ytd.add_argument("--year", help="Année (par défaut: celle de --until, ou l'année en cours)")
+    ytd.add_argument("--until", help="Dernière période incluse (AAAA-MM)")
+    ytd.add_argument("--top", type=int, help="Nombre de notices affichées")
+    return parser
+
+
+def resolve_period(period, xml_path):
+    """Période demandée, ou déduite du nom du fichier ('auto' ou absente)"""
+    if period and period != "auto":
+        return period
+    found = period_from_filename(xml_path)
+    if found is None:
+        raise ValueError(f"Impossible de déduire la période du nom {os.path.basename(xml_path)} : utilisez --period AAAA-MM")
+    return found
+
+
+def run_extract(args):
+    log = make_logger(args.quiet)
+    missing = [p for p in args.xml_paths if not os.path.exists(p)]
+    if missing:
+        log(f"Fichier introuvable: {', '.join(missing)}", "ERROR")
+        return 1
+    pipeline = ExtractionPipeline(
+        args.xml_paths, output_path=args.output, formats=args.formats or DEFAULT_FORMATS,
+        fetch_metadata=not args.no_metadata, use_cache=not args.no_cache,
+        harvest=args.harvest, base_url=args.endpoint, max_workers=args.workers,
+        requests_per_second=args.rate,
+        period=resolve_period(args.period, args.xml_paths[0]) if args.period else None,
+        jobs=args.jobs, report=args.report, report_sheet=args.report_sheet,
+        profile_mode=args.profile, pipelined=args.pipeline, coverage=args.coverage, top=args.top,
+        max_requests=args.max_requests, time_budget=args.time_budget, resume=not args.no_resume,
+        parse_cache=not args.no_parse_cache, log=log,
+        progress=make_progress(not args.quiet and sys.stderr.isatty())
+    )
+    paths = pipeline.run()
+    if paths is None:
+        return 1
+    for path in paths:
+        print(path)
+    return 0
+
+
+def run_harvest(args):
+    log = make_logger(args.quiet)
+    cache = OAICache()
+    try:
+        harvest_oai_records(
+            cache, base_url=args.endpoint, prefix=args.prefix,
+            from_date=args.from_date, until_date=args.until_date, log=log
+        )
+    finally:
+        cache.close()
+    return 0
+
+
+def run_history(args):
+    store = PeriodStore(args.db)
+    try:
+        if args.history_command == "ingest":
+            log = make_logger(args.quiet)
+            # Fichiers regroupés par période (un export par site et par jour, par exemple)
+            by_period = {}
+            for xml_path in args.xml_paths:
+                by_period.setdefault(resolve_period(args.period, xml_path), []).append(xml_path)
+            for period, paths in by_period.items():
+                if len(paths) == 1:
+                    notices, _ = parse_xml(paths[0], log=log)
+                    source = os.path.basename(paths[0])
+                else:
+                    notices, _ = parse_many(paths, args.jobs, log=log)
+                    source = f"{len(paths)} fichiers"
+                count = store.ingest(period, notices, source=source)
+                log(f"Période {period} enregistrée: {count} notices ({source})", "SUCCESS")
+        elif args.history_command == "periods":
+            for period, source, notices, ingested_at in store.periods():
+                ingested = datetime.fromtimestamp(ingested_at).strftime("%d/%m/%Y %H:%M")
+                print(f"{period}\t{notices}\t{source or ''}\t{ingested}")
+        elif args.history_command == "trend":
+            print("periode\tvisites\tvisiteurs_uniques\tpages_vues\ttemps_total")
+            for row in store.trend(args.ark, args.start, args.end):
+                print("\t".join(str(v) for v in row))
+        else:
+            print("ark\tid_ark\ttype\ttitre\tvisites\tvisiteurs_uniques\tpages_vues\ttemps_total\tperiodes")
+            for row in store.year_to_date(args.year, args.until, args.top):
+                print("\t".join(str(v) for v in row))
+    finally:
+        store.close()
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        if args.command == "extract":
+            return run_extract(args)
+        if args.command == "history":
+            return run_history(args)
+        return run_harvest(args)
+    except KeyboardInterrupt:
+        print("Interrompu", file=sys.stderr)
+        return 130
+    except Exception as e:
+        print(format_log_message(f"Erreur: {str(e)}", "ERROR"), file=sys.stderr)
+        return 1
@@ -0,0 +1,347 @@
+"""Export Excel des statistiques ARK
+
+Le classeur est écrit en flux (mode write-only d'openpyxl) : chaque ligne part
+sur le disque dès qu'elle est ajoutée, la mémoire reste stable quel que soit
+le nombre de notices. Les cellules partagent quelques styles nommés et
+l'alternance des couleurs de lignes passe par une mise en forme conditionnelle.
+"""
+
+from datetime import datetime
+from collections import defaultdict
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+from openpyxl.utils import get_column_letter
+
+from .classify import component_type
+from .oai import OAI_STATUS_DEFERRED
+
+# Styles nommés partagés par toutes les cellules d'un même rôle
+STYLE_HEADER = "ARK En-tête"
+STYLE_CELL = "ARK Cellule"
+STYLE_NUMBER = "ARK Nombre"
+STYLE_LINK = "ARK Lien"
+STYLE_TOP_HEADER = "ARK En-tête Top 20"
+STYLE_COMP_HEADER = "ARK En-tête composantes"
+STYLE_COMP_LINK = "ARK Lien composante"
+
+# Couleurs des lignes alternées et des titres trouvés (mise en forme conditionnelle)
+ALT_FILL_COLOR = 'e8f0fe'
+SUCCESS_FILL_COLOR = 'd4edda'
+COMP_ALT_FILL_COLOR = 'deebf7'
+
+# En-têtes - Stats Matomo + TOUS les champs Dublin Core
+HEADERS = [
+    'Rang', 'ARK complet', 'ID ARK', 'Type ressource',
+    # Métadonnées OAI-PMH
+    'Titre', 'Auteur', 'Contributeur', 'Date', 'Éditeur',
+    'Bibliothèque / Source', 'Cote / Identifiant', 'Type document',
+    'Sujets', 'Format', 'Langue', 'Droits', 'Description',
+    # Statistiques Matomo
+    'Visites', 'Visiteurs uniques', 'Pages vues',
+    'Temps total (s)', 'Temps moyen', 'Taux rebond', 'Taux sortie',
+    'Entrées', 'Sorties', 'URL',
+    'Statut OAI'  # différée : hors budget d'enrichissement, à compléter
+]
+
+# Largeurs colonnes (28 colonnes)
+WIDTHS = [
+    6,   # Rang
+    32,  # ARK complet
+    28,  # ID ARK
+    25,  # Type ressource
+    # Métadonnées OAI
+    50,  # Titre
+    30,  # Auteur
+    25,  # Contributeur
+    12,  # Date
+    35,  # Éditeur
+    30,  # Bibliothèque / Source
+    25,  # Cote
+    30,  # Type document
+    40,  # Sujets
+    15,  # Format
+    10,  # Langue
+    25,  # Droits
+    50,  # Description
+    # Stats Matomo
+    10,  # Visites
+    16,  # Visiteurs uniques
+    12,  # Pages vues
+    14,  # Temps total
+    12,  # Temps moyen
+    12,  # Taux rebond
+    12,  # Taux sortie
+    10,  # Entrées
+    10,  # Sorties
+    70,  # URL
+    12   # Statut OAI
+]
+
+NUMBER_COLUMNS = (18, 19, 20, 21, 25, 26)  # Alignées à droite
+URL_COLUMN = 27
+
+HEADERS4 = ['ARK Notice', 'Titre Notice', 'ID Composante', 'Type', 'Visites', 'Visiteurs', 'Pages vues', 'Temps (s)', 'Taux rebond', 'URL']
+WIDTHS4 = [35, 50, 18, 18, 10, 12, 12, 12, 12, 75]
+
+HEADERS5 = ['Étape', 'Durée (s)', 'CPU (s)', 'Lignes', 'Lignes/s', 'Pic mémoire (Mo)', 'Détails']
+WIDTHS5 = [26, 12, 12, 12, 12, 18, 90]
+# Mesures communes à toutes les étapes (colonnes de la feuille) ou trop détaillées pour elle
+REPORT_COLUMNS = ('label', 'wall_s', 'cpu_s', 'rows', 'rows_per_s', 'peak_rss_mb', 'functions', 'allocations')
+REPORT_DETAILS = {
+    'files': 'fichiers', 'input_mb': 'Mo lus', 'titles': 'titres', 'absent': 'absentes',
+    'errors': 'erreurs', 'cache_hits': 'lues en cache', 'requests': 'requêtes', 'connections': 'connexions',
+    'retries': 'reprises', 'http_errors': 'erreurs HTTP', 'python_peak_mb': 'pic Python (Mo)',
+    'parse_s': 'dont lecture (s)', 'deferred': 'différées', 'coverage_pct': '% des visites couvertes',
+    'resumed': 'reprises du journal', 'parse_cache': 'cache de lecture',
+    'retried': 'nouveaux essais', 'timeouts': 'délais dépassés', 'gave_up': 'abandons',
+    'breaker_trips': 'suspensions', 'breaker_pause_s': 'suspendu (s)', 'timeout_s': 'délai adaptatif (s)',
+}
+
+
+def register_styles(wb):
+    """Déclare les styles nommés du classeur (une seule entrée de style par rôle)"""
+    border = Border(
+        left=Side(style='thin', color='cccccc'),
+        right=Side(style='thin', color='cccccc'),
+        top=Side(style='thin', color='cccccc'),
+        bottom=Side(style='thin', color='cccccc')
+    )
+    link_font = Font(color='0563C1', underline='single')
+    styles = [
+        NamedStyle(STYLE_HEADER, font=Font(bold=True, color='FFFFFF', size=11),
+                   fill=PatternFill('solid', fgColor='1f538d'), border=border,
+                   alignment=Alignment(horizontal='center', vertical='center', wrap_text=True)),
+        NamedStyle(STYLE_CELL, border=border),
+        NamedStyle(STYLE_NUMBER, border=border, alignment=Alignment(horizontal='right')),
+        NamedStyle(STYLE_LINK, border=border, font=link_font),
+        NamedStyle(STYLE_TOP_HEADER, font=Font(bold=True), fill=PatternFill('solid', fgColor='d9e2f3')),
+        NamedStyle(STYLE_COMP_HEADER, font=Font(bold=True, color='FFFFFF'), fill=PatternFill('solid', fgColor='5b9bd5')),
+        NamedStyle(STYLE_COMP_LINK, font=link_font),
+    ]
+    for style in styles:
+        wb.add_named_style(style)
+
+
+def styled(ws, value, style=None, font=None):
+    """Cellule write-only avec un style nommé (ou une police pour les titres isolés)"""
+    cell = WriteOnlyCell(ws, value=value)
+    if style:
+        cell.style = style
+    if font:
+        cell.font = font
+    return cell
+
+
+def alternate_rows(ws, cell_range, color, parity):
+    """Fond alterné des lignes (ROW() modulo 2 == parity) par mise en forme conditionnelle"""
+    ws.conditional_formatting.add(cell_range, FormulaRule(
+        formula=[f'MOD(ROW(),2)={parity}'],
+        fill=PatternFill('solid', start_color=color, end_color=color)
+    ))
+
+
+def report_details(stage):
+    """Compteurs propres à une étape du rapport, en une ligne (requêtes, latences...)"""
+    details = []
+    for key, value in stage.items():
+        if key in REPORT_COLUMNS or value in (None, {}, []):
+            continue
+        if key == 'latency_ms':
+            details.append("latence " + ", ".join(f"{p} {ms:g} ms" for p, ms in value.items()))
+        else:
+            details.append(f"{REPORT_DETAILS.get(key, key)}: {value}")
+    return ", ".join(details)
+
+
+def generate_excel(notices, components, output_path, source_name="", metadata_enabled=True, log=None,
+                   report=None):
+    """Génère le fichier Excel avec toutes les données
+
+    report : rapport de performance (RunProfile.to_dict) des étapes déjà
+    terminées, écrit dans une feuille Performances.
+    """
+    log = log or (lambda message, level="INFO": None)
+    log("Génération du fichier Excel...")
+
+    wb = Workbook(write_only=True)
+    register_styles(wb)
+
+    # === Feuille 1: Données principales ===
+    ws = wb.create_sheet("Statistiques ARK")
+    last_row = len(notices) + 1
+
+    # Largeurs, gel et hauteur d'en-tête : à fixer avant la première ligne
+    for i, w in enumerate(WIDTHS, 1):
+        ws.column_dimensions[get_column_letter(i)].width = w
+    ws.row_dimensions[1].height = 30
+    ws.freeze_panes = 'E2'  # Figer les colonnes ARK + scroll sur métadonnées
+
+    ws.append([styled(ws, header, STYLE_HEADER) for header in HEADERS])
+
+    # Style nommé par colonne, partagé par toutes les lignes
+    column_styles = [
+        STYLE_LINK if col == URL_COLUMN else STYLE_NUMBER if col in NUMBER_COLUMNS else STYLE_CELL
+        for col in range(1, len(HEADERS) + 1)
+    ]
+
+    # Données
+    for idx, item in enumerate(notices, 1):
+        values = [
+            idx,
+            item.ark,
+            item.ark_id,
+            item.type,
+            # Métadonnées OAI-PMH
+            item.titre,
+            item.auteur,
+            item.contributeur,
+            item.date,
+            item.editeur,
+            item.bibliotheque,
+            item.cote,
+            item.type_oai,
+            item.sujet,
+            item.format_doc,
+            item.langue,
+            item.droits,
+            item.description,
+            # Statistiques Matomo (entiers dès la lecture du XML)
+            item.nb_visits,
+            item.nb_uniq_visitors,
+            item.nb_hits,
+            item.sum_time_spent,
+            item.avg_time_on_page,  # Format texte "00:01:23"
+            item.bounce_rate,  # Format texte "45 %"
+            item.exit_rate,  # Format texte "30 %"
+            item.entry_nb_visits,
+            item.exit_nb_visits,
+            item.url,
+            item.statut_oai
+        ]
+        row = [styled(ws, value, style) for value, style in zip(values, column_styles)]
+        if item.url:
+            row[URL_COLUMN - 1].hyperlink = item.url
+        ws.append(row)
+
+    if notices:
+        # Surligner si titre trouvé (prioritaire sur l'alternance)
+        ws.conditional_formatting.add(f"E2:E{last_row}", FormulaRule(
+            formula=['LEN($E2)>0'], stopIfTrue=True,
+            fill=PatternFill('solid', start_color=SUCCESS_FILL_COLOR, end_color=SUCCESS_FILL_COLOR)
+        ))
+        # Une ligne sur deux (rang pair, soit ligne impaire)
+        alternate_rows(ws, f"A2:AB{last_row}", ALT_FILL_COLOR, 1)
+
+    # Filtre
+    ws.auto_filter.ref = f"A1:AB{last_row}"
+
+    # === Feuille 2: Résumé ===
+    ws2 = wb.create_sheet("Résumé")
+    for col, w in zip('ABCD', (35, 15, 15, 15)):
+        ws2.column_dimensions[col].width = w
+
+    bold_12 = Font(bold=True, size=12)
+    ws2.append([styled(ws2, "📊 Résumé des statistiques", font=Font(bold=True, size=16))])
+    ws2.append([])
+    ws2.append(["Date d'extraction:", datetime.now().strftime("%d/%m/%Y %H:%M")])
+    ws2.append(["Fichier source:", source_name])
+    ws2.append(["Méthode métadonnées:", "API OAI-PMH" if metadata_enabled else "Non activée"])
+    ws2.append([])
+    ws2.append([styled(ws2, "Statistiques globales", font=bold_12)])
+    ws2.append(["Nombre de notices ARK:", len(notices)])
+    ws2.append(["Notices avec titre:", sum(1 for d in notices if d.titre)])
+    deferred = sum(1 for d in notices if d.statut_oai == OAI_STATUS_DEFERRED)
+    if deferred:
+        ws2.append(["Notices différées (à compléter):", deferred])
+    ws2.append(["Total des visites:", sum(d.nb_visits for d in notices)])
+    ws2.append(["Total des pages vues:", sum(d.nb_hits for d in notices)])
+    ws2.append([])
+
+    # Par type
+    ws2.append([styled(ws2, "Par type de ressource", font=bold_12)])
+
+    type_counts = defaultdict(lambda: {'count': 0, 'visits': 0, 'with_title': 0})
+    for item in notices:
+        t = item.type or 'Autre'
+        type_counts[t]['count'] += 1
+        type_counts[t]['visits'] += item.nb_visits
+        if item.titre:
+            type_counts[t]['with_title'] += 1
+
+    bold = Font(bold=True)
+    ws2.append([styled(ws2, h, font=bold) for h in ("Type", "Notices", "Avec titre", "Visites")])
+    for t, data in sorted(type_counts.items(), key=lambda x: x[1]['visits'], reverse=True):
+        ws2.append([t, data['count'], data['with_title'], data['visits']])
+
+    # === Feuille 3: Top 20 ===
+    ws3 = wb.create_sheet("Top 20")
+    for col, w in zip('ABCDEF', (8, 60, 28, 30, 12, 12)):
+        ws3.column_dimensions[col].width = w
+
+    ws3.append([styled(ws3, "🏆 Top 20 des ressources les plus consultées", font=Font(bold=True, size=14))])
+    ws3.append([])
+    ws3.append([styled(ws3, h, STYLE_TOP_HEADER) for h in ['Rang', 'Titre / ARK', 'Type', 'Auteur', 'Visites', 'Pages vues']])
+
+    for idx, item in enumerate(notices[:20], 1):
+        title = item.titre or item.ark_id
+        ws3.append([idx, title[:60], item.type[:25], item.auteur[:30], item.nb_visits, item.nb_hits])
+
+    # === Feuille 4: Composantes BAP/BHP (toujours générée) ===
+    if components:
+        ws4 = wb.create_sheet("Composantes")
+        for i, w in enumerate(WIDTHS4, 1):
+            ws4.column_dimensions[get_column_letter(i)].width = w
+        ws4.freeze_panes = 'A5'
+
+        ws4.append([styled(ws4, "📄 Détail par composante (BAP, BHP, pages numérisées)", font=Font(bold=True, size=14))])
+        ws4.append([styled(ws4, f"Total: {len(components)} composantes", font=Font(italic=True, color='666666'))])
+        ws4.append([])
+        ws4.append([styled(ws4, h, STYLE_COMP_HEADER) for h in HEADERS4])
+
+        # Trier par visites
+        sorted_components = sorted(components, key=lambda x: x.nb_visits, reverse=True)
+
+        for comp in sorted_components:
+            comp_id = comp.component_id
+            url = comp.url
+            if url:
+                url = styled(ws4, url, STYLE_COMP_LINK)
+                url.hyperlink = comp.url
+            ws4.append([
+                comp.ark_notice, comp.titre_notice, comp_id, comp.type or component_type(comp_id),
+                comp.nb_visits, comp.nb_uniq_visitors, comp.nb_hits, comp.sum_time_spent,
+                comp.bounce_rate,  # Texte "45 %"
+                url
+            ])
+
+        # Alternance couleurs (rang pair, soit ligne paire)
+        last_comp_row = len(components) + 4
+        alternate_rows(ws4, f"A5:J{last_comp_row}", COMP_ALT_FILL_COLOR, 0)
+        ws4.auto_filter.ref = f"A4:J{last_comp_row}"
+
+    # === Feuille 5: Performances (rapport des étapes précédant l'export) ===
+    if report:
+        ws5 = wb.create_sheet("Performances")
+        for i, w in enumerate(WIDTHS5, 1):
+            ws5.column_dimensions[get_column_letter(i)].width = w
+
+        ws5.append([styled(ws5, "⏱️ Performances de l'extraction", font=Font(bold=True, size=14))])
+        ws5.append([styled(ws5, f"Version {report['version']} - {report['date']} - Python {report['python']} "
+                                f"- {report['platform']}", font=Font(italic=True, color='666666'))])
+        ws5.append([])
+        ws5.append([styled(ws5, h, STYLE_TOP_HEADER) for h in HEADERS5])
+        for stage in report['stages'].values():
+            ws5.append([stage['label'], stage['wall_s'], stage['cpu_s'], stage['rows'], stage['rows_per_s'],
+                        stage['peak_rss_mb'], report_details(stage)])
+        ws5.append([styled(ws5, "Total", font=Font(bold=True)), report['total_s']])
+        ws5.append([])
+        ws5.append([styled(ws5, "L'écriture de ce classeur n'est pas incluse (voir le rapport JSON)",
+                           font=Font(italic=True, color='666666'))])
+
+    # Sauvegarder
+    wb.save(output_path)
+
+    return output_path
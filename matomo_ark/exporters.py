@@ -0,0 +1,184 @@
+"""Formats de sortie : Excel, CSV, Parquet et SQLite
+
+Chaque format écrit les mêmes deux tables (notices et composantes) et se
+choisit par son nom à chaque exécution (voir EXPORTERS). Les lignes sont
+produites à la demande, sans copie intermédiaire des tables (Parquet
+les regroupe par lots de BATCH_ROWS lignes). Le rapport de performance
+(report, voir RunProfile.to_dict) n'est repris que dans le classeur Excel.
+"""
+
+import os
+import csv
+import sqlite3
+from dataclasses import dataclass
+from typing import Callable
+
+from .classify import component_type
+
+# Colonnes des tables exportées, dans l'ordre de la feuille Excel
+NOTICE_COLUMNS = (
+    'rang', 'ark', 'ark_id', 'naan', 'type',
+    # Métadonnées OAI-PMH
+    'titre', 'auteur', 'contributeur', 'date', 'editeur', 'bibliotheque', 'cote',
+    'type_oai', 'sujet', 'format_doc', 'langue', 'droits', 'relation', 'description',
+    # Statistiques Matomo
+    'nb_visits', 'nb_uniq_visitors', 'nb_hits', 'sum_time_spent', 'avg_time_on_page',
+    'bounce_rate', 'exit_rate', 'entry_nb_visits', 'entry_bounce_count', 'exit_nb_visits', 'url',
+    'statut_oai',  # Notices différées (budget d'enrichissement) à compléter
+)
+COMPONENT_COLUMNS = (
+    'ark_notice', 'titre_notice', 'component_id', 'type',
+    'nb_visits', 'nb_uniq_visitors', 'nb_hits', 'sum_time_spent', 'avg_time_on_page',
+    'bounce_rate', 'exit_rate', 'entry_nb_visits', 'entry_bounce_count', 'exit_nb_visits', 'url',
+)
+# Colonnes entières (les autres sont du texte)
+INTEGER_COLUMNS = frozenset((
+    'rang', 'nb_visits', 'nb_uniq_visitors', 'nb_hits', 'sum_time_spent',
+    'entry_nb_visits', 'entry_bounce_count', 'exit_nb_visits',
+))
+
+BATCH_ROWS = 100_000  # Lignes par lot (groupes de lignes Parquet)
+
+
+def notice_rows(notices):
+    """Lignes de la table des notices, dans l'ordre du classement"""
+    for rank, item in enumerate(notices, 1):
+        yield (
+            rank, item.ark, item.ark_id, item.naan, item.type,
+            item.titre, item.auteur, item.contributeur, item.date, item.editeur,
+            item.bibliotheque, item.cote, item.type_oai, item.sujet, item.format_doc,
+            item.langue, item.droits, item.relation, item.description,
+            item.nb_visits, item.nb_uniq_visitors, item.nb_hits, item.sum_time_spent,
+            item.avg_time_on_page, item.bounce_rate, item.exit_rate,
+            item.entry_nb_visits, item.entry_bounce_count, item.exit_nb_visits, item.url, item.statut_oai,
+        )
+
+
+def component_rows(components):
+    """Lignes de la table des composantes, triées par visites comme dans Excel"""
+    for comp in sorted(components, key=lambda x: x.nb_visits, reverse=True):
+        yield (
+            comp.ark_notice, comp.titre_notice, comp.component_id, comp.type or component_type(comp.component_id),
+            comp.nb_visits, comp.nb_uniq_visitors, comp.nb_hits, comp.sum_time_spent,
+            comp.avg_time_on_page, comp.bounce_rate, comp.exit_rate,
+            comp.entry_nb_visits, comp.entry_bounce_count, comp.exit_nb_visits, comp.url,
+        )
+
+
+def batched(rows, size=BATCH_ROWS):
+    """Découpe un itérable de lignes en listes d'au plus size lignes"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def table_path(output_path, table):
+    """Fichier d'une table pour les formats à un fichier par table (stats.csv -> stats_notices.csv)"""
+    stem, ext = os.path.splitext(output_path)
+    return f"{stem}_{table}{ext}"
+
+
+def write_excel(notices, components, output_path, source_name="", metadata_enabled=True, log=None,
+                report=None):
+    """Classeur Excel (voir generate_excel), avec la feuille Performances si report est fourni"""
+    from .export import generate_excel  # openpyxl n'est chargé qu'à l'export Excel
+    return [generate_excel(notices, components, output_path, source_name, metadata_enabled, log, report)]
+
+
+def write_csv(notices, components, output_path, source_name="", metadata_enabled=True, log=None,
+              report=None):
+    """Deux fichiers CSV (UTF-8, séparateur virgule) écrits ligne à ligne"""
+    log = log or (lambda message, level="INFO": None)
+    log("Génération des fichiers CSV...")
+    paths = []
+    for table, columns, rows in (('notices', NOTICE_COLUMNS, notice_rows(notices)),
+                                 ('composantes', COMPONENT_COLUMNS, component_rows(components))):
+        path = table_path(output_path, table)
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+        paths.append(path)
+    return paths
+
+
+def write_parquet(notices, components, output_path, source_name="", metadata_enabled=True, log=None,
+                  report=None):
+    """Deux fichiers Parquet (compression zstd), écrits par groupes de BATCH_ROWS lignes"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Le format Parquet nécessite pyarrow (pip install pyarrow)")
+
+    log = log or (lambda message, level="INFO": None)
+    log("Génération des fichiers Parquet...")
+    paths = []
+    for table, columns, rows in (('notices', NOTICE_COLUMNS, notice_rows(notices)),
+                                 ('composantes', COMPONENT_COLUMNS, component_rows(components))):
+        schema = pa.schema([(c, pa.int64() if c in INTEGER_COLUMNS else pa.string()) for c in columns])
+        path = table_path(output_path, table)
+        with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+            for batch in batched(rows):
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)],
+                    schema=schema
+                ))
+        paths.append(path)
+    return paths
+
+
+def write_sqlite(notices, components, output_path, source_name="", metadata_enabled=True, log=None,
+                 report=None):
+    """Base SQLite (tables notices et composantes), index sur l'ARK et le type"""
+    log = log or (lambda message, level="INFO": None)
+    log("Génération de la base SQLite...")
+    if os.path.exists(output_path):
+        os.remove(output_path)  # Une base par exécution, comme les autres formats
+
+    conn = sqlite3.connect(output_path)
+    try:
+        # Écriture en masse : pas de journal, la base est recréée en cas d'échec
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        for table, columns, rows in (('notices', NOTICE_COLUMNS, notice_rows(notices)),
+                                     ('composantes', COMPONENT_COLUMNS, component_rows(components))):
+            definition = ", ".join(f"{c} {'INTEGER' if c in INTEGER_COLUMNS else 'TEXT'}" for c in columns)
+            conn.execute(f"CREATE TABLE {table} ({definition})")
+            conn.executemany(
+                f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})", rows
+            )
+        # Index créés après le chargement (plus rapide que de les tenir à jour)
+        conn.execute("CREATE INDEX idx_notices_ark ON notices (ark)")
+        conn.execute("CREATE INDEX idx_notices_type ON notices (type)")
+        conn.execute("CREATE INDEX idx_composantes_ark ON composantes (ark_notice)")
+        conn.execute("CREATE INDEX idx_composantes_type ON composantes (type)")
+        conn.commit()
+    finally:
+        conn.close()
+    return [output_path]
+
+
+@dataclass(frozen=True)
+class Exporter:
+    """Format de sortie : extension du fichier et fonction d'écriture"""
+    name: str
+    extension: str
+    description: str
+    write: Callable
+
+
+EXPORTERS = {
+    exporter.name: exporter for exporter in (
+        Exporter('xlsx', '.xlsx', "Classeur Excel (4 feuilles)", write_excel),
+        Exporter('csv', '.csv', "CSV (un fichier par table)", write_csv),
+        Exporter('parquet', '.parquet', "Parquet compressé (nécessite pyarrow)", write_parquet),
+        Exporter('sqlite', '.sqlite', "Base SQLite indexée", write_sqlite),
+    )
+}
+DEFAULT_FORMATS = ('xlsx',)
@@ -0,0 +1,160 @@
+"""Historique multi-périodes des statistiques ARK (SQLite)
+
+Chaque export Matomo lu est ajouté comme une période datée (mois "AAAA-MM" ou
+jour "AAAA-MM-JJ"), indexée par ARK. Réintégrer une période la remplace. Les
+évolutions par ARK et les cumuls depuis le début de l'année sont calculés par
+SQL sur les index, sans relire les fichiers XML.
+"""
+
+import os
+import re
+import time
+import sqlite3
+
+from .oai import get_app_dir
+
+HISTORY_FILENAME = "historique_matomo.sqlite3"
+
+# Compteurs conservés par période (les taux texte ne sont pas cumulables)
+HISTORY_COUNTERS = ('nb_visits', 'nb_uniq_visitors', 'nb_hits', 'sum_time_spent',
+                    'entry_nb_visits', 'entry_bounce_count', 'exit_nb_visits')
+
+PERIOD_PATTERN = re.compile(r'^\d{4}-(0[1-9]|1[0-2])(-(0[1-9]|[12]\d|3[01]))?$')
+# Date dans un nom de fichier : 2024-03, 2024_03, 202403, 2024-03-15...
+FILENAME_PERIOD_PATTERN = re.compile(r'(?<!\d)(\d{4})[-_.]?(0[1-9]|1[0-2])(?:[-_.]?(0[1-9]|[12]\d|3[01]))?(?!\d)')
+
+
+def check_period(period):
+    """Valide une période "AAAA-MM" ou "AAAA-MM-JJ" et la renvoie"""
+    if not PERIOD_PATTERN.match(period or ''):
+        raise ValueError(f"Période invalide: {period!r} (attendu AAAA-MM ou AAAA-MM-JJ)")
+    return period
+
+
+def period_upper_bound(period):
+    """Borne haute incluant les jours d'un mois ("2024-03" < "2024-03-15" <= "2024-03-99")"""
+    return period + "-99" if len(period) == 7 else period
+
+
+def period_from_filename(path):
+    """Période déduite du nom d'un export (ex. export_2024-03.xml -> "2024-03"), ou None"""
+    match = FILENAME_PERIOD_PATTERN.search(os.path.basename(path))
+    if not match:
+        return None
+    year, month, day = match.groups()
+    return f"{year}-{month}-{day}" if day else f"{year}-{month}"
+
+
+class PeriodStore:
+    """Base locale des statistiques par période et par ARK"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_app_dir(), HISTORY_FILENAME)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS periods (
+                period TEXT PRIMARY KEY,
+                source TEXT,
+                notices INTEGER NOT NULL,
+                ingested_at REAL NOT NULL
+            )
+        """)
+        # Clé (ark, period) : l'évolution d'un ARK est une lecture de l'index primaire
+        counters = ",\n".join(f"                {c} INTEGER NOT NULL" for c in HISTORY_COUNTERS)
+        self.conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS stats (
+                ark TEXT NOT NULL,
+                period TEXT NOT NULL,
+{counters},
+                PRIMARY KEY (ark, period)
+            ) WITHOUT ROWID
+        """)
+        # Période d'abord : remplacement d'une période et cumuls annuels
+        self.conn.execute("CREATE INDEX IF NOT EXISTS stats_period ON stats (period, ark)")
+        # Description des ARK (dernier titre connu)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS arks (
+                ark TEXT PRIMARY KEY,
+                ark_id TEXT NOT NULL,
+                type TEXT NOT NULL,
+                titre TEXT NOT NULL DEFAULT ''
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS arks_ark_id ON arks (ark_id)")
+        self.conn.commit()
+
+    def ingest(self, period, notices, source=None):
+        """Ajoute (ou remplace) une période ; renvoie le nombre de notices enregistrées"""
+        check_period(period)
+        with self.conn:  # Une seule transaction : la période est remplacée en entier ou pas du tout
+            self.conn.execute("DELETE FROM stats WHERE period = ?", (period,))
+            self.conn.executemany(
+                f"INSERT INTO stats VALUES (?, ?, {', '.join('?' * len(HISTORY_COUNTERS))})",
+                ((n.ark, period, *(getattr(n, c) for c in HISTORY_COUNTERS)) for n in notices)
+            )
+            # Un titre vide (métadonnées non demandées) ne remplace pas un titre connu
+            self.conn.executemany(
+                """INSERT INTO arks VALUES (?, ?, ?, ?)
+                   ON CONFLICT (ark) DO UPDATE SET type = excluded.type,
+                       titre = CASE WHEN excluded.titre != '' THEN excluded.titre ELSE arks.titre END""",
+                ((n.ark, n.ark_id, n.type, n.titre) for n in notices)
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO periods VALUES (?, ?, ?, ?)",
+                (period, source, len(notices), time.time())
+            )
+        return len(notices)
+
+    def periods(self):
+        """Périodes enregistrées : [(période, fichier source, notices, date d'intégration)]"""
+        return self.conn.execute(
+            "SELECT period, source, notices, ingested_at FROM periods ORDER BY period"
+        ).fetchall()
+
+    def resolve_ark(self, ark):
+        """ARK complet à partir d'un ARK complet ou d'un ID ARK (pf..., FRCGM...)"""
+        row = self.conn.execute(
+            "SELECT ark FROM arks WHERE ark = ? UNION ALL SELECT ark FROM arks WHERE ark_id = ? LIMIT 1",
+            (ark, ark)
+        ).fetchone()
+        return row[0] if row else ark
+
+    def trend(self, ark, start=None, end=None):
+        """Évolution d'un ARK : [(période, visites, visiteurs uniques, pages vues, temps total)]"""
+        return self.conn.execute(
+            """SELECT period, nb_visits, nb_uniq_visitors, nb_hits, sum_time_spent
+               FROM stats WHERE ark = ? AND period >= ? AND period <= ?
+               ORDER BY period""",
+            (self.resolve_ark(ark), start or '', period_upper_bound(end) if end else '9999')
+        ).fetchall()
+
+    def year_to_date(self, year=None, until=None, limit=None):
+        """Cumuls par ARK depuis le début de l'année jusqu'à la période until (incluse)
+
+        Renvoie [(ark, ark_id, type, titre, visites, visiteurs uniques, pages vues,
+        temps total, périodes)], par visites décroissantes. Les visiteurs uniques ne
+        s'additionnent pas d'une période à l'autre : on garde le maximum. Une même
+        année ne doit pas mélanger périodes mensuelles et journalières.
+        """
+        if until is None:
+            year = year or time.strftime("%Y")
+            until = f"{year}-12-31"
+        else:
+            check_period(until)
+            year = year or until[:4]
+        return self.conn.execute(
+            f"""SELECT s.ark, a.ark_id, a.type, a.titre,
+                       SUM(s.nb_visits) AS visits, MAX(s.nb_uniq_visitors), SUM(s.nb_hits),
+                       SUM(s.sum_time_spent), COUNT(*)
+                FROM stats s JOIN arks a ON a.ark = s.ark
+                WHERE s.period >= ? AND s.period <= ?
+                GROUP BY s.ark
+                ORDER BY visits DESC, s.ark
+                {'LIMIT ?' if limit else ''}""",
+            (f"{year}-01", period_upper_bound(until), *((limit,) if limit else ()))
+        ).fetchall()
+
+    def close(self):
+        self.conn.close()
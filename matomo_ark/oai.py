@@ -0,0 +1,1265 @@
+"""Enrichissement des notices via l'API OAI-PMH du catalogue Portfolio
+
+GetRecord en parallèle sous un seau à jetons, cache SQLite local,
+moisson incrémentale ListRecords et connexions HTTP persistantes.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import threading
+import xml.etree.ElementTree as ET
+from collections import defaultdict, deque
+from contextlib import contextmanager
+import urllib.parse
+
+from .classify import get_type_from_ark
+from .profiling import percentiles
+
+
+# Configuration OAI-PMH
+OAI_BASE_URL = "https://bibliotheques-specialisees.paris.fr/in/rest/oai"
+OAI_IDENTIFIER_PREFIX = "oai:bibliotheques-specialisees.paris.fr:"
+OAI_PMH_NS = "http://www.openarchives.org/OAI/2.0/"
+# Formats à tester dans l'ordre de priorité
+OAI_METADATA_PREFIXES = ["oai_dc_syracuse", "oai_dc", "inmedia"]
+OAI_MAX_WORKERS = 4  # Requêtes simultanées au maximum
+OAI_REQUESTS_PER_SECOND = 10.0  # Budget de politesse envers le catalogue (seau à jetons)
+OAI_CANCEL_POLL_SECONDS = 0.2  # Délai de prise en compte d'une annulation pendant l'attente des réponses
+OAI_CANCEL_JOIN_SECONDS = 0.5  # Attente maximale des requêtes en cours après une annulation
+
+# Délais et nouvelles tentatives des requêtes (OAIHttpClient.get)
+OAI_TIMEOUT = 30  # Délai maximal d'une requête (s), et délai tant que les latences sont inconnues
+OAI_TIMEOUT_MIN = 2.0  # Délai adaptatif minimal (s)
+OAI_TIMEOUT_P99_FACTOR = 4  # Délai adaptatif : 4 fois le p99 des latences récentes
+OAI_LATENCY_WINDOW = 200  # Latences récentes retenues pour le délai adaptatif
+OAI_LATENCY_MIN_SAMPLES = 20  # Latences connues avant d'adapter le délai
+OAI_MAX_ATTEMPTS = 4  # Essais par requête (échecs passagers : réseau, délai dépassé, HTTP 429/5xx)
+OAI_RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+OAI_BACKOFF_BASE = 0.5  # Attente avant le 2e essai (s), doublée à chaque essai, tirée au hasard en dessous
+OAI_BACKOFF_MAX = 30.0
+OAI_RETRY_AFTER_MAX = 120.0  # Retry-After plafonné (s)
+OAI_BREAKER_FAILURES = 10  # Échecs consécutifs avant de suspendre toutes les requêtes (panne, pas erreurs éparses)
+OAI_BREAKER_COOLDOWN = 5.0  # Première suspension (s), doublée tant que l'essai échoue
+OAI_BREAKER_MAX_COOLDOWN = 120.0
+
+# Cache local des métadonnées OAI-PMH (à côté de l'application)
+OAI_CACHE_FILENAME = "oai_cache.sqlite3"
+OAI_CACHE_TTL_DAYS = 30  # Durée de validité des notices trouvées
+OAI_CACHE_NEGATIVE_TTL_DAYS = 7  # Durée de validité des réponses négatives
+OAI_CACHE_MAX_MB = 200  # Taille maximale avant éviction des plus anciennes
+OAI_HARVEST_PREFIX = "oai_dc"  # Format moissonné en masse (ListRecords)
+
+# Statut de la réponse GetRecord
+OAI_STATUS_OK = 'ok'
+OAI_STATUS_ABSENT = 'absent'  # idDoesNotExist / noRecordsMatch
+OAI_STATUS_ERROR = 'erreur'  # cannotDisseminateFormat ou autre erreur OAI
+OAI_STATUS_DEFERRED = 'différée'  # Hors budget d'enrichissement et absente du cache (jamais mise en cache)
+
+
+def get_app_dir():
+    """Dossier de l'application (celui de l'exécutable une fois compilé avec PyInstaller)"""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_oai_response(xml_text):
+    """Parse la réponse XML OAI-PMH pour extraire les métadonnées (Dublin Core + inmedia)"""
+    try:
+        return parse_oai_element(ET.fromstring(xml_text))
+    except Exception:
+        return None
+
+
+# Champs Dublin Core extraits, dans l'ordre du dictionnaire de métadonnées
+OAI_DC_FIELDS = ('title', 'creator', 'date', 'publisher', 'description', 'type',
+                 'subject', 'identifier', 'source', 'format', 'rights', 'language',
+                 'relation', 'coverage', 'contributor')
+OAI_DC_JOINED_FIELDS = ('subject', 'type', 'rights')  # Toutes les valeurs, séparées par " | "
+
+# Propriétés inmedia (<inmedia:property name="...">) -> champ Dublin Core complété
+OAI_INMEDIA_FIELDS = {
+    'title': 'title', 'creator': 'creator', 'author': 'creator', 'date': 'date',
+    'publisher': 'publisher', 'description': 'description', 'source': 'source',
+    'ark': 'identifier',
+}
+
+# Balise complète -> champ Dublin Core, 'property' (inmedia) ou None ; mémorisé au fil des réponses
+_oai_tag_kinds = {}
+
+
+def _oai_tag_kind(tag):
+    kind = _oai_tag_kinds.get(tag)
+    if kind is None:
+        tag_local = tag[tag.rfind('}') + 1:]
+        if tag_local.lower() in OAI_DC_FIELDS:
+            kind = tag_local.lower()
+        elif tag_local == 'property':
+            kind = 'property'
+        else:
+            kind = ''
+        _oai_tag_kinds[tag] = kind
+    return kind
+
+
+def parse_oai_element(root):
+    """Extrait les métadonnées (Dublin Core + inmedia) d'un élément OAI-PMH déjà parsé
+    (réponse GetRecord complète ou <record> d'une page ListRecords), en un seul parcours"""
+    try:
+        found = {}  # Champ Dublin Core -> valeurs distinctes dans l'ordre du document
+        properties = []  # Propriétés inmedia (nom, valeur) dans l'ordre du document
+        
+        for e in root.iter():
+            text = e.text
+            if not text:
+                continue
+            kind = _oai_tag_kind(e.tag)
+            if not kind:
+                continue
+            
+            value = text.strip()
+            if not value:
+                continue
+            if kind == 'property':
+                properties.append(((e.attrib.get('name') or '').lower(), value))
+            else:
+                found.setdefault(kind, {})[value] = None
+        
+        # 1. Champs Dublin Core (dc:title, dc:creator, etc.)
+        metadata = {}
+        for dc_elem in OAI_DC_FIELDS:
+            found_values = found.get(dc_elem)
+            if not found_values:
+                continue
+            if dc_elem in OAI_DC_JOINED_FIELDS:
+                metadata[dc_elem] = ' | '.join(found_values)
+            elif dc_elem == 'identifier':
+                non_url = [v for v in found_values if not v.startswith('http') and not v.startswith('oai:')]
+                metadata[dc_elem] = ' | '.join(non_url) if non_url else ''
+            else:
+                metadata[dc_elem] = next(iter(found_values))
+        
+        # 2. Compléter avec les propriétés inmedia si présentes
+        # Format: <inmedia:property name="title">valeur</inmedia:property>
+        for name, value in properties:
+            if name == 'subject':
+                prev = metadata.get('subject', '')
+                metadata['subject'] = (prev + ' | ' if prev else '') + value
+            else:
+                field = OAI_INMEDIA_FIELDS.get(name)
+                if field and not metadata.get(field):
+                    metadata[field] = value
+        
+        return metadata if metadata else None
+        
+    except Exception:
+        return None
+
+
+class TokenBucket:
+    """Limiteur de débit (seau à jetons) partagé entre les threads d'enrichissement"""
+    
+    def __init__(self, rate, capacity=1):
+        self.rate = rate  # Jetons par seconde
+        self.capacity = max(1, capacity)  # Rafale maximale
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self, cancel=None):
+        """Attend qu'un jeton soit disponible puis le consomme ; False si cancel est posé entre-temps"""
+        while True:
+            if cancel is not None and cancel.is_set():
+                return False
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if cancel is not None:
+                cancel.wait(wait)
+            else:
+                time.sleep(wait)
+
+
+class EnrichmentBudget:
+    """Budget de l'enrichissement : notices, requêtes, durée et part des visites couvertes
+    
+    Les notices sont demandées par visites décroissantes, et seules les premières
+    (jusqu'à couvrir coverage des visites, 0.95 = 95 %, ou max_notices notices)
+    le sont au catalogue ; les suivantes ne sont cherchées que dans le cache.
+    max_requests (requêtes GetRecord) et max_seconds (depuis le début de
+    l'enrichissement) arrêtent les requêtes en cours de route. Les notices restées
+    sans réponse sont marquées différées (OAI_STATUS_DEFERRED) : une exécution
+    suivante les complète, les notices déjà connues venant alors du cache.
+    Le classement supposant des compteurs définitifs, enrich_notices n'accepte
+    un budget qu'avec une liste de notices, pas un flux.
+    """
+    
+    def __init__(self, max_requests=None, max_seconds=None, coverage=None, max_notices=None):
+        if coverage is not None and not 0 < coverage <= 1:
+            raise ValueError(f"Couverture invalide: {coverage} (entre 0 et 1, 0.95 = 95 % des visites)")
+        self.max_requests = max_requests
+        self.max_seconds = max_seconds
+        self.coverage = coverage
+        self.max_notices = max_notices
+        self.used = 0  # Requêtes accordées
+        self.deadline = None
+        self.stopped = False  # Budget de requêtes ou de temps épuisé
+        self.lock = threading.Lock()
+    
+    def plan(self, notices):
+        """Nombre de notices de tête (triées par visites décroissantes) à demander au catalogue"""
+        count = len(notices)
+        if self.max_notices is not None:
+            count = min(count, self.max_notices)
+        target = self.coverage * sum(item.nb_visits for item in notices) if self.coverage is not None else 0
+        if target > 0:  # Sans visites comptées, la couverture ne limite rien
+            covered = 0
+            for i in range(count):
+                if covered >= target:
+                    count = i
+                    break
+                covered += notices[i].nb_visits
+        return count
+    
+    def start(self):
+        if self.max_seconds is not None:
+            self.deadline = time.monotonic() + self.max_seconds
+    
+    def take(self):
+        """Réserve une requête ; False une fois le budget de requêtes ou de temps épuisé"""
+        with self.lock:
+            if not self.stopped:
+                if self.max_requests is not None and self.used >= self.max_requests:
+                    self.stopped = True
+                elif self.deadline is not None and time.monotonic() >= self.deadline:
+                    self.stopped = True
+                else:
+                    self.used += 1
+            return not self.stopped
+    
+    def describe(self):
+        """Limites du budget, pour le journal"""
+        limits = []
+        if self.coverage is not None:
+            limits.append(f"{self.coverage * 100:g} % des visites")
+        if self.max_notices is not None:
+            limits.append(f"{self.max_notices} notices")
+        if self.max_requests is not None:
+            limits.append(f"{self.max_requests} requêtes")
+        if self.max_seconds is not None:
+            limits.append(f"{self.max_seconds:g} s")
+        return ", ".join(limits) or "aucune limite"
+
+
+class OAICache:
+    """Cache persistant (SQLite) des réponses GetRecord, par identifiant OAI et format
+    
+    Les réponses valides sont conservées ttl_days jours ; les réponses négatives
+    (idDoesNotExist, cannotDisseminateFormat...) negative_ttl_days jours, pour ne pas
+    réinterroger les ARK morts à chaque exécution. Au-delà de max_mb, les entrées les
+    plus anciennes sont supprimées. Les erreurs réseau ne sont jamais mises en cache.
+    Les formats annoncés par chaque endpoint sont conservés à part, ttl_days jours.
+    """
+    
+    def __init__(self, path=None, ttl_days=OAI_CACHE_TTL_DAYS,
+                 negative_ttl_days=OAI_CACHE_NEGATIVE_TTL_DAYS, max_mb=OAI_CACHE_MAX_MB):
+        self.path = path or os.path.join(get_app_dir(), OAI_CACHE_FILENAME)
+        self.ttl = ttl_days * 86400
+        self.negative_ttl = negative_ttl_days * 86400
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.pending = 0  # Écritures non encore validées
+        
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS records (
+                identifier TEXT NOT NULL,
+                prefix TEXT NOT NULL,
+                status TEXT NOT NULL,
+                metadata TEXT,
+                fetched_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                PRIMARY KEY (identifier, prefix)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS records_fetched_at ON records (fetched_at)")
+        # Stock alimenté par le moissonnage ListRecords (tenu à jour par les moissons
+        # incrémentales, donc sans durée de validité ni éviction)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS harvested (
+                identifier TEXT NOT NULL,
+                prefix TEXT NOT NULL,
+                status TEXT NOT NULL,
+                metadata TEXT,
+                PRIMARY KEY (identifier, prefix)
+            )
+        """)
+        # Formats appris par famille d'ARK (voir PrefixLearner)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS prefix_stats (
+                family TEXT NOT NULL,
+                prefix TEXT NOT NULL,
+                successes INTEGER NOT NULL,
+                failures INTEGER NOT NULL,
+                PRIMARY KEY (family, prefix)
+            )
+        """)
+        # Formats annoncés par chaque endpoint (ListMetadataFormats)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS endpoint_formats (
+                base_url TEXT PRIMARY KEY,
+                formats TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS harvests (
+                base_url TEXT NOT NULL,
+                prefix TEXT NOT NULL,
+                until TEXT,
+                PRIMARY KEY (base_url, prefix)
+            )
+        """)
+        self.conn.commit()
+    
+    def get(self, identifier, prefix):
+        """Retourne (statut, métadonnées) si une entrée valide existe, sinon None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT status, metadata, fetched_at FROM records WHERE identifier = ? AND prefix = ?",
+                (identifier, prefix)
+            ).fetchone()
+            
+            if row is not None:
+                status, metadata, fetched_at = row
+                ttl = self.ttl if status == OAI_STATUS_OK else self.negative_ttl
+                if time.time() - fetched_at <= ttl:
+                    self.hits += 1
+                    return status, json.loads(metadata) if metadata else None
+            
+            self.misses += 1
+            return None
+    
+    def put(self, identifier, prefix, status, metadata):
+        """Enregistre la réponse obtenue pour (identifiant, format)"""
+        payload = json.dumps(metadata, ensure_ascii=False) if metadata else None
+        size = len(identifier) + len(prefix) + len(payload or '') + 32
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?)",
+                (identifier, prefix, status, payload, time.time(), size)
+            )
+            self.pending += 1
+            if self.pending >= 100:
+                self.conn.commit()
+                self.pending = 0
+    
+    def get_harvested(self, identifier, prefixes):
+        """Retourne (format, statut, métadonnées) depuis le stock moissonné, en suivant
+        l'ordre de priorité des formats, ou None si la notice n'a pas été moissonnée"""
+        with self.lock:
+            rows = dict((row[0], row[1:]) for row in self.conn.execute(
+                "SELECT prefix, status, metadata FROM harvested WHERE identifier = ?", (identifier,)
+            ))
+        
+        for prefix in prefixes:
+            if prefix in rows:
+                status, metadata = rows[prefix]
+                metadata = json.loads(metadata) if metadata else None
+                if status == OAI_STATUS_ABSENT or (metadata and metadata.get('title')):
+                    return prefix, status, metadata
+        return None
+    
+    def put_harvested(self, identifier, prefix, status, metadata):
+        """Enregistre (ou supprime logiquement) une notice moissonnée"""
+        payload = json.dumps(metadata, ensure_ascii=False) if metadata else None
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO harvested VALUES (?, ?, ?, ?)",
+                (identifier, prefix, status, payload)
+            )
+            self.pending += 1
+            if self.pending >= 100:
+                self.conn.commit()
+                self.pending = 0
+    
+    def get_harvest_date(self, base_url, prefix):
+        """Date (AAAA-MM-JJ) de la dernière moisson complète, None si jamais moissonné"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT until FROM harvests WHERE base_url = ? AND prefix = ?", (base_url, prefix)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def set_harvest_date(self, base_url, prefix, until):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO harvests VALUES (?, ?, ?)", (base_url, prefix, until))
+            self.conn.commit()
+            self.pending = 0
+    
+    def load_prefix_stats(self):
+        """Statistiques apprises {(famille, format): [succès, échecs]}"""
+        with self.lock:
+            return {
+                (family, prefix): [successes, failures]
+                for family, prefix, successes, failures in self.conn.execute("SELECT * FROM prefix_stats")
+            }
+    
+    def save_prefix_stats(self, stats):
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO prefix_stats VALUES (?, ?, ?, ?)",
+                [(family, prefix, s, f) for (family, prefix), (s, f) in stats.items()]
+            )
+            self.conn.commit()
+            self.pending = 0
+    
+    def get_endpoint_formats(self, base_url):
+        """Formats annoncés par l'endpoint (liste), None s'ils sont inconnus ou plus vieux que ttl_days"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT formats, fetched_at FROM endpoint_formats WHERE base_url = ?", (base_url,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+    
+    def set_endpoint_formats(self, base_url, formats):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO endpoint_formats VALUES (?, ?, ?)",
+                              (base_url, json.dumps(sorted(formats)), time.time()))
+            self.conn.commit()
+            self.pending = 0
+    
+    def evict(self):
+        """Supprime les entrées expirées puis les plus anciennes au-delà de la taille maximale"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "DELETE FROM records WHERE fetched_at < CASE WHEN status = ? THEN ? ELSE ? END",
+                (OAI_STATUS_OK, now - self.ttl, now - self.negative_ttl)
+            )
+            self.conn.execute("""
+                DELETE FROM records WHERE rowid IN (
+                    SELECT rowid FROM (
+                        SELECT rowid, SUM(size) OVER (ORDER BY fetched_at DESC, rowid DESC) AS total
+                        FROM records
+                    ) WHERE total > ?
+                )
+            """, (self.max_bytes,))
+            self.conn.commit()
+            self.pending = 0
+    
+    def close(self):
+        self.evict()
+        with self.lock:
+            self.conn.close()
+
+
+class OAIHttpError(Exception):
+    """Réponse HTTP en erreur (statut >= 400) de l'endpoint OAI-PMH
+    
+    retry_after : attente demandée par l'en-tête Retry-After (s), None sans en-tête.
+    """
+    
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value):
+    """Attente (s) d'un en-tête Retry-After (secondes ou date HTTP), plafonnée ; None si illisible"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        from email.utils import parsedate_to_datetime
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), OAI_RETRY_AFTER_MAX)
+
+
+def is_transient(error):
+    """Échec passager, à retenter : réseau, délai dépassé, HTTP 429 ou 5xx"""
+    if isinstance(error, OAIHttpError):
+        return error.status in OAI_RETRY_STATUSES
+    import http.client
+    return isinstance(error, (OSError, http.client.HTTPException))
+
+
+def backoff_delay(attempt):
+    """Attente avant l'essai attempt + 2 : exponentielle, tirée au hasard en dessous (full jitter)"""
+    return random.uniform(0, min(OAI_BACKOFF_MAX, OAI_BACKOFF_BASE * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Disjoncteur partagé par les threads d'un client HTTP
+    
+    Après failures échecs passagers consécutifs, le circuit s'ouvre : toutes les
+    requêtes attendent cooldown secondes (au moins le Retry-After reçu). Une
+    seule requête d'essai part ensuite ; un succès referme le circuit, un échec
+    le rouvre pour une durée doublée (jusqu'à max_cooldown). Le débit baisse
+    ainsi par paliers au lieu d'épuiser chaque notice en délais dépassés.
+    """
+    
+    def __init__(self, failures=OAI_BREAKER_FAILURES, cooldown=OAI_BREAKER_COOLDOWN,
+                 max_cooldown=OAI_BREAKER_MAX_COOLDOWN):
+        self.threshold = failures
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.failures = 0  # Échecs consécutifs
+        self.open_until = None  # Circuit ouvert jusqu'à (time.monotonic), None s'il est fermé
+        self.probe = None  # Thread de la requête d'essai (circuit demi-ouvert)
+        self.trips = 0
+        self.paused = 0.0  # Suspensions cumulées (s)
+        self.condition = threading.Condition()
+    
+    def wait(self, cancel=None):
+        """Attend que le circuit laisse passer une requête ; False si cancel est posé entre-temps
+        (vérifié toutes les OAI_CANCEL_POLL_SECONDS secondes)"""
+        poll = OAI_CANCEL_POLL_SECONDS if cancel is not None else None
+        with self.condition:
+            while self.open_until is not None:
+                if cancel is not None and cancel.is_set():
+                    return False
+                remaining = self.open_until - time.monotonic()
+                if remaining > 0:
+                    self.condition.wait(min(remaining, poll or remaining))
+                elif self.probe is None:
+                    self.probe = threading.get_ident()  # Demi-ouvert : cette requête sert d'essai
+                    return True
+                else:
+                    self.condition.wait(poll)
+            return True
+    
+    def success(self):
+        with self.condition:
+            self.failures = 0
+            if self.open_until is not None:
+                self.open_until = None
+                self.probe = None
+                self.cooldown = self.base_cooldown
+                self.condition.notify_all()
+    
+    def failure(self, retry_after=None):
+        """Échec passager ; ouvre le circuit au seuil atteint ou si l'essai a échoué"""
+        with self.condition:
+            self.failures += 1
+            probe_failed = self.probe == threading.get_ident()
+            if probe_failed or (self.open_until is None and self.failures >= self.threshold):
+                if probe_failed:
+                    self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+                self.probe = None
+                pause = max(self.cooldown, retry_after or 0)
+                self.open_until = time.monotonic() + pause
+                self.trips += 1
+                self.paused += pause
+                self.condition.notify_all()
+
+
+class OAIHttpClient:
+    """Client HTTP(S) à connexions persistantes (keep-alive) pour l'endpoint OAI-PMH
+    
+    Les connexions sont réutilisées d'une requête à l'autre (au plus pool_size
+    par hôte), avec un unique contexte SSL : la poignée de main TCP/TLS n'est
+    payée qu'à l'ouverture. Le temps d'établissement et le temps de transfert
+    sont cumulés séparément pour le rapport de fin d'enrichissement.
+    get retente les échecs passagers (voir get) ; son délai s'adapte aux
+    latences observées (OAI_TIMEOUT_P99_FACTOR fois le p99 des OAI_LATENCY_WINDOW
+    dernières requêtes, entre OAI_TIMEOUT_MIN et timeout).
+    """
+    
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)',
+        'Accept': 'application/xml; charset=utf-8',
+        'Accept-Charset': 'utf-8',
+        'Accept-Encoding': 'identity',
+    }
+    
+    def __init__(self, pool_size=OAI_MAX_WORKERS, timeout=OAI_TIMEOUT, max_attempts=OAI_MAX_ATTEMPTS, breaker=None):
+        import ssl
+        
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.breaker = breaker or CircuitBreaker()
+        self.recent = deque(maxlen=OAI_LATENCY_WINDOW)  # Latences récentes (délai adaptatif)
+        self.adaptive_timeout = timeout
+        # Contexte SSL construit une seule fois et partagé par toutes les connexions
+        self.ssl_ctx = ssl.create_default_context()
+        self.ssl_ctx.check_hostname = False
+        self.ssl_ctx.verify_mode = ssl.CERT_NONE
+        
+        self.lock = threading.Lock()
+        self.idle = defaultdict(list)  # (schéma, hôte, port) -> connexions libres
+        self.slots = {}  # (schéma, hôte, port) -> sémaphore limitant les connexions ouvertes
+        
+        # Statistiques
+        self.requests = 0
+        self.connections = 0
+        self.connect_time = 0.0
+        self.transfer_time = 0.0
+        self.latencies = []  # Durée de chaque requête réussie (s), pour les percentiles
+        self.retries = 0  # Requêtes renvoyées sur une nouvelle connexion
+        self.http_errors = 0
+        self.retried = 0  # Nouveaux essais après un échec passager
+        self.timeouts = 0
+        self.gave_up = 0  # Requêtes en échec après max_attempts essais
+    
+    def _checkout(self, key):
+        with self.lock:
+            slots = self.slots.setdefault(key, threading.BoundedSemaphore(self.pool_size))
+        slots.acquire()
+        with self.lock:
+            if self.idle[key]:
+                return self.idle[key].pop()
+        
+        import http.client
+        scheme, host, port = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout, context=self.ssl_ctx)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+    
+    def _checkin(self, key, conn, reusable):
+        if reusable:
+            with self.lock:
+                self.idle[key].append(conn)
+        else:
+            conn.close()
+        self.slots[key].release()
+    
+    @contextmanager
+    def open(self, url, timeout=None):
+        """Envoie un GET et fournit la réponse (objet fichier) ; la connexion
+        retourne dans le pool une fois la réponse entièrement lue"""
+        import http.client
+        
+        for _ in range(5):  # Suivre les redirections
+            parts = urllib.parse.urlsplit(url)
+            key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+            
+            conn = self._checkout(key)
+            reusable = False
+            try:
+                for attempt in range(2):
+                    fresh = conn.sock is None
+                    if fresh:
+                        start = time.perf_counter()
+                        conn.timeout = timeout or self.timeout
+                        conn.connect()
+                        with self.lock:
+                            self.connections += 1
+                            self.connect_time += time.perf_counter() - start
+                    else:
+                        conn.sock.settimeout(timeout or self.timeout)
+                    
+                    start = time.perf_counter()
+                    try:
+                        conn.request('GET', path, headers=self.HEADERS)
+                        response = conn.getresponse()
+                        break
+                    except (http.client.RemoteDisconnected, ConnectionError):
+                        # Connexion fermée par le serveur pendant son inactivité : on en rouvre une
+                        conn.close()
+                        if fresh or attempt:
+                            raise
+                        with self.lock:
+                            self.retries += 1
+                
+                if response.status in (301, 302, 303, 307, 308) and response.getheader('Location'):
+                    response.read()
+                    reusable = not response.will_close
+                    url = urllib.parse.urljoin(url, response.getheader('Location'))
+                    continue
+                
+                if response.status >= 400:
+                    response.read()
+                    reusable = not response.will_close
+                    with self.lock:
+                        self.http_errors += 1
+                    raise OAIHttpError(f"HTTP Error {response.status}: {response.reason}", response.status,
+                                       parse_retry_after(response.getheader('Retry-After')))
+                
+                yield response
+                response.read()  # Vider le reste pour pouvoir réutiliser la connexion
+                reusable = not response.will_close
+                elapsed = time.perf_counter() - start
+                with self.lock:
+                    self.requests += 1
+                    self.transfer_time += elapsed
+                    self.latencies.append(elapsed)
+                    self.recent.append(elapsed)
+                    if len(self.recent) >= OAI_LATENCY_MIN_SAMPLES and self.requests % 10 == 0:
+                        p99 = percentiles(self.recent, (99,))['p99'] / 1000
+                        self.adaptive_timeout = min(self.timeout, max(OAI_TIMEOUT_MIN, p99 * OAI_TIMEOUT_P99_FACTOR))
+                return
+            finally:
+                self._checkin(key, conn, reusable)
+        
+        raise OAIHttpError("Trop de redirections")
+    
+    def get(self, url, timeout=None, limiter=None, cancel=None):
+        """Retourne le corps de la réponse (bytes)
+        
+        Les échecs passagers (réseau, délai dépassé, HTTP 429 ou 5xx) sont
+        retentés jusqu'à max_attempts essais, après l'attente demandée par
+        Retry-After ou une attente exponentielle tirée au hasard ; le délai
+        adaptatif double à chaque essai. Chaque essai passe par le disjoncteur
+        et prend un jeton de limiter (TokenBucket) s'il est fourni. Une fois
+        cancel (threading.Event) posé, les attentes s'interrompent et get lève
+        OAIHttpError sans nouvel essai.
+        """
+        for attempt in range(self.max_attempts):
+            if not self.breaker.wait(cancel) or (limiter is not None and not limiter.acquire(cancel)):
+                raise OAIHttpError("Requête annulée")
+            try:
+                with self.open(url, timeout or min(self.timeout, self.adaptive_timeout * 2 ** attempt)) as response:
+                    body = response.read()
+            except Exception as e:
+                if not is_transient(e):
+                    self.breaker.success()  # L'endpoint a répondu
+                    raise
+                retry_after = getattr(e, 'retry_after', None)
+                self.breaker.failure(retry_after)
+                last = attempt + 1 == self.max_attempts
+                with self.lock:
+                    if isinstance(e, TimeoutError):
+                        self.timeouts += 1
+                    if last:
+                        self.gave_up += 1
+                    else:
+                        self.retried += 1
+                if last:
+                    raise
+                delay = retry_after if retry_after is not None else backoff_delay(attempt)
+                if cancel is None:
+                    time.sleep(delay)
+                elif cancel.wait(delay):
+                    raise OAIHttpError("Requête annulée") from e
+                continue
+            self.breaker.success()
+            return body
+    
+    def timing_report(self):
+        """Lignes du rapport connexion / transfert"""
+        if not self.requests:
+            return []
+        return [
+            f"Requêtes HTTP: {self.requests} sur {self.connections} connexion(s) ouverte(s)",
+            f"Établissement TCP/TLS: {self.connect_time:.1f} s au total, "
+            f"{self.connect_time / max(self.connections, 1) * 1000:.0f} ms par connexion",
+            f"Transfert: {self.transfer_time:.1f} s au total, "
+            f"{self.transfer_time / self.requests * 1000:.0f} ms par requête",
+            f"Nouveaux essais: {self.retried} (délais dépassés: {self.timeouts}, abandons: {self.gave_up}) - "
+            f"délai adaptatif: {self.adaptive_timeout:.1f} s",
+        ] + ([f"Disjoncteur: {self.breaker.trips} suspension(s) des requêtes, {self.breaker.paused:.0f} s au total"]
+             if self.breaker.trips else [])
+    
+    def stats(self):
+        """Compteurs pour le rapport de performance (latences en ms)"""
+        return {
+            'requests': self.requests,
+            'connections': self.connections,
+            'retries': self.retries,
+            'http_errors': self.http_errors,
+            'retried': self.retried,
+            'timeouts': self.timeouts,
+            'gave_up': self.gave_up,
+            'breaker_trips': self.breaker.trips,
+            'breaker_pause_s': round(self.breaker.paused, 1),
+            'timeout_s': round(self.adaptive_timeout, 2),
+            'latency_ms': percentiles(self.latencies),
+        }
+    
+    def close(self):
+        with self.lock:
+            for conns in self.idle.values():
+                for conn in conns:
+                    conn.close()
+            self.idle.clear()
+
+
+def harvest_oai_records(cache, base_url=OAI_BASE_URL, prefix=OAI_HARVEST_PREFIX,
+                        from_date=None, until_date=None, log=None, limiter=None, client=None):
+    """Moissonne le catalogue avec ListRecords et alimente le stock local du cache
+    
+    Suit les resumptionToken page par page ; chaque page est lue en flux et ses
+    <record> libérés au fur et à mesure. Sans from_date, reprend à la date de la
+    dernière moisson complète pour ce format (moisson incrémentale), ou moissonne
+    tout le catalogue la première fois. Retourne le nombre de notices enregistrées.
+    """
+    log = log or (lambda message, level="INFO": None)
+    client = client or OAIHttpClient(pool_size=1)
+    if from_date is None:
+        from_date = cache.get_harvest_date(base_url, prefix)
+    
+    params = {'verb': 'ListRecords', 'metadataPrefix': prefix}
+    if from_date:
+        params['from'] = from_date
+    if until_date:
+        params['until'] = until_date
+    log(f"Moissonnage ListRecords ({prefix}) depuis {from_date or 'le début'}...", "PROGRESS")
+    
+    url = f"{base_url}?{urllib.parse.urlencode(params)}"
+    harvest_date = None
+    count = 0
+    pages = 0
+    
+    while url:
+        if limiter is not None:
+            limiter.acquire()
+        
+        token = None
+        with client.open(url, timeout=120) as response:
+            for event, elem in ET.iterparse(response, events=('end',)):
+                tag_local = elem.tag.split('}')[-1]
+                
+                # Seuls les <record> OAI-PMH (le format inmedia a aussi son <inmedia:record>)
+                if elem.tag == f'{{{OAI_PMH_NS}}}record':
+                    header = elem.find(f'{{{OAI_PMH_NS}}}header')
+                    identifier = header.findtext(f'{{{OAI_PMH_NS}}}identifier', '') if header is not None else ''
+                    if identifier:
+                        if header.get('status') == 'deleted':
+                            cache.put_harvested(identifier, prefix, OAI_STATUS_ABSENT, None)
+                        else:
+                            cache.put_harvested(identifier, prefix, OAI_STATUS_OK, parse_oai_element(elem))
+                        count += 1
+                    elem.clear()
+                elif tag_local == 'responseDate' and harvest_date is None:
+                    harvest_date = (elem.text or '')[:10]
+                elif tag_local == 'resumptionToken':
+                    token = (elem.text or '').strip()
+                elif tag_local == 'error':
+                    code = elem.get('code', '')
+                    if code != 'noRecordsMatch':  # Rien de modifié depuis la dernière moisson
+                        raise RuntimeError(f"Erreur OAI-PMH {code}: {(elem.text or '').strip()}")
+        
+        pages += 1
+        if pages % 10 == 0:
+            log(f"  {pages} pages, {count} notices moissonnées", "PROGRESS")
+        
+        url = f"{base_url}?{urllib.parse.urlencode({'verb': 'ListRecords', 'resumptionToken': token})}" if token else None
+    
+    cache.set_harvest_date(base_url, prefix, until_date or harvest_date)
+    log(f"Moissonnage terminé: {count} notices en {pages} page(s)", "SUCCESS")
+    return count
+
+
+class PrefixLearner:
+    """Apprend, pour chaque famille d'ARK (get_type_from_ark), quel metadataPrefix
+    fournit des métadonnées, afin de le tester en premier
+    
+    Le score d'un format est son taux de succès lissé ; à score égal, l'ordre de
+    priorité de départ est conservé. Partagé entre les threads d'enrichissement.
+    """
+    
+    def __init__(self, prefixes=OAI_METADATA_PREFIXES, stats=None):
+        self.prefixes = list(prefixes)
+        self.stats = defaultdict(lambda: [0, 0], stats or {})  # (famille, format) -> [succès, échecs]
+        self.lock = threading.Lock()
+    
+    def order(self, family):
+        """Formats à tester pour cette famille, le plus fiable en premier"""
+        with self.lock:
+            scores = {}
+            for prefix in self.prefixes:
+                successes, failures = self.stats.get((family, prefix), (0, 0))
+                scores[prefix] = (successes + 1) / (successes + failures + 2)
+        return sorted(self.prefixes, key=lambda prefix: -scores[prefix])
+    
+    def record(self, family, prefix, success):
+        with self.lock:
+            self.stats[(family, prefix)][0 if success else 1] += 1
+    
+    def summary(self):
+        """Format préféré par famille, pour le journal"""
+        families = sorted({family for family, _ in self.stats})
+        return {family: self.order(family)[0] for family in families}
+
+
+def list_metadata_formats(client, base_url=OAI_BASE_URL, cache=None, limiter=None):
+    """Formats (metadataPrefix) annoncés par ListMetadataFormats, None si indisponible"""
+    if cache is not None:
+        cached = cache.get_endpoint_formats(base_url)
+        if cached:
+            return set(cached)
+    
+    try:
+        root = ET.fromstring(client.get(f"{base_url}?verb=ListMetadataFormats", limiter=limiter))
+    except Exception:
+        return None
+    
+    formats = {e.text.strip() for e in root.iter(f'{{{OAI_PMH_NS}}}metadataPrefix') if e.text}
+    if formats and cache is not None:
+        cache.set_endpoint_formats(base_url, formats)
+    return formats or None
+
+
+def fetch_oai_record(ark, ark_id, base_url=OAI_BASE_URL, prefixes=OAI_METADATA_PREFIXES,
+                     limiter=None, trace=None, cache=None, client=None, learner=None,
+                     budget=None, network=True, cancel=None):
+    """Interroge GetRecord pour un ARK en testant chaque format jusqu'à obtenir un titre
+    
+    Appelée depuis les threads d'enrichissement : ne touche pas à l'interface,
+    les messages détaillés sont ajoutés à trace (liste de (message, niveau)) si fournie.
+    Avec un PrefixLearner, les formats sont testés dans l'ordre appris pour la
+    famille de l'ARK (prefixes est alors ignoré) et chaque réponse du catalogue
+    (pas celles du cache) l'alimente.
+    Sans network, ou une fois le budget (EnrichmentBudget) épuisé, seul le cache
+    est consulté et le statut vaut OAI_STATUS_DEFERRED faute de réponse ; une fois
+    l'annulation demandée (cancel, threading.Event), de même sans toucher au cache.
+    Retourne (métadonnées, format retenu, statut de la dernière réponse, trace),
+    le statut valant None si aucune réponse n'a été obtenue.
+    """
+    oai_identifier = f"{OAI_IDENTIFIER_PREFIX}{ark}"
+    client = client or OAIHttpClient(pool_size=1)
+    family = get_type_from_ark(ark_id)
+    if learner is not None:
+        prefixes = learner.order(family)
+    
+    metadata = None
+    last_status = None
+    working_format = None
+    
+    # Annulation : plus aucun accès au cache, que l'appelant peut avoir fermé
+    if cancel is not None and cancel.is_set():
+        return None, None, OAI_STATUS_DEFERRED, trace
+    
+    # Notice déjà présente dans le stock moissonné (ListRecords) ?
+    if cache is not None:
+        harvested = cache.get_harvested(oai_identifier, prefixes)
+        if harvested is not None:
+            working_format, last_status, metadata = harvested
+            if trace is not None:
+                trace.append((f"  Stock moissonné ({working_format}) pour {ark_id}", "PROGRESS"))
+            return metadata, working_format if metadata else None, last_status, trace
+    
+    # Tester chaque format jusqu'à en trouver un qui fonctionne
+    for meta_prefix in prefixes:
+        oai_url = f"{base_url}?verb=GetRecord&identifier={oai_identifier}&metadataPrefix={meta_prefix}"
+        
+        if trace is not None:
+            trace.append((f"  Test {meta_prefix} pour {ark_id}", "PROGRESS"))
+        if cancel is not None and cancel.is_set():
+            last_status, metadata = OAI_STATUS_DEFERRED, None
+            break
+        
+        cached = cache.get(oai_identifier, meta_prefix) if cache is not None else None
+        if cached is not None:
+            last_status, metadata = cached
+            if trace is not None:
+                trace.append((f"    → cache ({last_status})", "PROGRESS"))
+        else:
+            if not network or (budget is not None and not budget.take()):
+                last_status, metadata = OAI_STATUS_DEFERRED, None
+                if trace is not None:
+                    trace.append(("    → différée (budget d'enrichissement)", "PROGRESS"))
+                break
+            try:
+                raw_bytes = client.get(oai_url, limiter=limiter, cancel=cancel)
+                # Forcer UTF-8
+                response_text = raw_bytes.decode('utf-8', errors='replace')
+            except Exception as e:
+                # Échec après les nouveaux essais du client : format suivant, la notice
+                # restant à redemander (ni cache ni journal de reprise)
+                if trace is not None:
+                    trace.append((f"    Exception: {str(e)[:50]}", "WARNING"))
+                continue
+            if cancel is not None and cancel.is_set():
+                # Réponse arrivée après l'annulation : ignorée, sans écriture dans le
+                # cache ni l'apprentissage, que l'appelant peut déjà avoir fermés
+                last_status, metadata = OAI_STATUS_DEFERRED, None
+                break
+            
+            if trace is not None:
+                trace.append((f"    → {len(response_text)} chars", "PROGRESS"))
+            
+            # Vérifier les erreurs OAI (idDoesNotExist, cannotDisseminateFormat...)
+            if 'idDoesNotExist' in response_text or 'noRecordsMatch' in response_text:
+                last_status, metadata = OAI_STATUS_ABSENT, None
+            elif '<error' in response_text:
+                last_status, metadata = OAI_STATUS_ERROR, None
+            else:
+                # Parser la réponse
+                last_status, metadata = OAI_STATUS_OK, parse_oai_response(response_text)
+            
+            if cache is not None:
+                cache.put(oai_identifier, meta_prefix, last_status, metadata)
+            # Réponses du catalogue seulement : celles du cache ont déjà été comptées
+            if learner is not None and last_status != OAI_STATUS_ABSENT:
+                learner.record(family, meta_prefix, bool(metadata and metadata.get('title')))
+        
+        found = bool(metadata and metadata.get('title'))
+        if found:
+            working_format = meta_prefix
+            break  # On a trouvé un format qui fonctionne !
+    
+    return metadata, working_format, last_status, trace
+
+
+def propagate_titles(notices, components, log=None):
+    """Reporte le titre de chaque notice sur ses composantes ; renvoie le nombre de composantes enrichies"""
+    log = log or (lambda message, level="INFO": None)
+    # Créer un dictionnaire ark (complet) → titre
+    titles_map = {item.ark: item.titre for item in notices if item.titre}
+    
+    comp_enriched = 0
+    for comp in components:
+        ark_notice = comp.ark_notice
+        if ark_notice and ark_notice in titles_map:
+            comp.titre_notice = titles_map[ark_notice]
+            comp_enriched += 1
+    
+    if comp_enriched > 0:
+        log(f"Composantes enrichies avec titre notice parente: {comp_enriched}", "SUCCESS")
+    return comp_enriched
+
+
+def enrich_notices(notices, components, log=None, progress=None, base_url=OAI_BASE_URL,
+                   max_workers=OAI_MAX_WORKERS, requests_per_second=OAI_REQUESTS_PER_SECOND,
+                   cache=None, store=None, budget=None, journal=None, cancel=None):
+    """Récupère les métadonnées via l'API OAI-PMH - teste plusieurs formats
+    
+    notices : liste, ou flux alimenté pendant la lecture ; budget, journal et cancel :
+    voir EnrichmentBudget et EnrichmentJournal. Retourne les compteurs de l'enrichissement.
+    """
+    log = log or (lambda message, level="INFO": None)
+    progress = progress or (lambda value, text: None)
+    total = len(notices) if hasattr(notices, '__len__') else None  # None : notices reçues en flux
+    if budget is not None and total is None:
+        raise ValueError("Le budget d'enrichissement suppose les compteurs définitifs (liste de notices)")
+    if total is None:
+        log("Récupération des métadonnées via OAI-PMH au fil de la lecture...")
+    else:
+        log(f"Récupération des métadonnées pour {total} notices via OAI-PMH...")
+    log(f"Endpoint: {base_url}")
+    log(f"Préfixe OAI: {OAI_IDENTIFIER_PREFIX}")
+    
+    success_count = 0
+    error_count = 0
+    no_record_count = 0
+    deferred_count = 0
+    answered_visits = 0  # Visites des notices ayant reçu une réponse (catalogue ou cache)
+    total_visits = 0
+    
+    limiter = TokenBucket(requests_per_second, capacity=max_workers)
+    client = OAIHttpClient(pool_size=max_workers)
+    
+    # Ne tester que les formats effectivement proposés par l'endpoint
+    supported = list_metadata_formats(client, base_url, cache, limiter)
+    prefixes = [p for p in OAI_METADATA_PREFIXES if supported is None or p in supported] or OAI_METADATA_PREFIXES
+    learner = PrefixLearner(prefixes, store.load_prefix_stats() if store is not None else None)
+    log(f"Formats testés: {', '.join(prefixes)} (ordre appris par type de ressource)")
+    log(f"Requêtes simultanées: {max_workers} - débit max: {requests_per_second:g} req/s")
+    
+    network_count = total  # Notices de tête demandées au catalogue (toutes sans budget)
+    if budget is not None:
+        # Les plus consultées d'abord (ordre du classement, conservé à égalité)
+        notices = sorted(notices, key=lambda item: item.nb_visits, reverse=True)
+        network_count = budget.plan(notices)
+        planned_visits = sum(item.nb_visits for item in notices[:network_count])
+        all_visits = sum(item.nb_visits for item in notices)
+        log(f"Budget d'enrichissement: {budget.describe()} - {network_count} notices demandées au catalogue "
+            f"sur {total} ({planned_visits / max(all_visits, 1) * 100:.1f} % des visites), les autres depuis le cache")
+        budget.start()
+    
+    resumed = journal.load() if journal is not None else {}
+    if resumed:
+        log(f"Reprise d'une extraction interrompue: {len(resumed)} notices déjà traitées", "INFO")
+    resumed_count = 0
+    breaker_trips = 0  # Suspensions du disjoncteur déjà signalées
+    
+    def record(i, item, future, fresh, expected):
+        """Résultat de la notice de rang i (expected : nombre total, None tant que le flux continue ;
+        fresh : réponse obtenue par cette exécution, à noter dans le journal)"""
+        nonlocal success_count, error_count, no_record_count, deferred_count, answered_visits, total_visits
+        nonlocal resumed_count, breaker_trips
+        # Mise à jour progression
+        if expected is None:
+            progress(0.2, f"Métadonnées: {i+1} notices (lecture en cours) - {item.ark_id[:20]}...")
+        else:
+            progress(0.2 + (i / max(expected, 1)) * 0.6, f"Métadonnées: {i+1}/{expected} - {item.ark_id[:20]}...")
+        
+        metadata, working_format, last_status, trace = future.result()
+        for message, level in trace or ():
+            log(message, level)
+        if client.breaker.trips > breaker_trips:
+            breaker_trips = client.breaker.trips
+            log(f"Catalogue en difficulté: requêtes suspendues (suspension n°{breaker_trips}, "
+                f"{client.breaker.paused:.0f} s au total)", "WARNING")
+        # Seuls un titre trouvé ou une notice inconnue du catalogue sont définitifs : une erreur
+        # peut venir d'un format essayé faute de réponse réseau sur le bon, la notice est redemandée
+        if not fresh:
+            resumed_count += 1
+        elif journal is not None and (working_format is not None or last_status == OAI_STATUS_ABSENT):
+            journal.put(item.ark, last_status, working_format, metadata)
+        
+        item.statut_oai = last_status or OAI_STATUS_ERROR
+        total_visits += item.nb_visits
+        if last_status != OAI_STATUS_DEFERRED:
+            answered_visits += item.nb_visits
+        
+        # Stocker les métadonnées si on en a trouvé
+        if metadata and metadata.get('title'):
+            item.titre = metadata.get('title', '')
+            item.auteur = metadata.get('creator', '')
+            item.contributeur = metadata.get('contributor', '')
+            item.date = metadata.get('date', '')
+            item.editeur = metadata.get('publisher', '')
+            item.description = metadata.get('description', '')[:300] if metadata.get('description') else ''
+            item.type_oai = metadata.get('type', '')
+            item.sujet = metadata.get('subject', '')
+            item.cote = metadata.get('identifier', '')
+            item.bibliotheque = metadata.get('source', '')
+            item.format_doc = metadata.get('format', '')
+            item.langue = metadata.get('language', '')
+            item.droits = metadata.get('rights', '')
+            item.relation = metadata.get('relation', '')
+            
+            success_count += 1
+            if success_count <= 5:
+                log(f"  ✓ [{working_format}] {item.ark_id}: {item.titre[:50]}...", "DATA")
+        elif last_status == OAI_STATUS_DEFERRED:
+            deferred_count += 1
+        else:
+            # Analyser pourquoi ça n'a pas marché
+            if last_status:
+                if last_status == OAI_STATUS_ABSENT:
+                    no_record_count += 1
+                    if no_record_count <= 3:
+                        log(f"  Notice non trouvée: {item.ark_id}", "WARNING")
+                else:
+                    error_count += 1
+                    if error_count <= 3:
+                        log(f"  Pas de métadonnées pour {item.ark_id}", "WARNING")
+            else:
+                error_count += 1
+    
+    from concurrent.futures import Future, ThreadPoolExecutor, wait  # Chargé à l'enrichissement seulement
+    
+    def stopped():
+        return cancel is not None and cancel.is_set()
+    
+    def ready(future):
+        """Attend la réponse ; False une fois l'annulation demandée (les réponses
+        arrivées depuis, différées faute de requête, ne sont pas retenues)"""
+        while not stopped():
+            if cancel is None or wait((future,), timeout=OAI_CANCEL_POLL_SECONDS).done:
+                return not stopped()
+        return False
+    
+    pending = deque()  # (notice, requête, réponse nouvelle) pas encore traitées, dans l'ordre des notices
+    done = 0
+    cancelled = False
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for i, item in enumerate(notices):
+            if stopped():
+                cancelled = True
+                break
+            previous = resumed.get(item.ark)
+            if previous is not None:
+                status, working_format, metadata = previous
+                future = Future()
+                future.set_result((metadata, working_format, status, None))
+            else:
+                future = pool.submit(
+                    fetch_oai_record, item.ark, item.ark_id, base_url, prefixes, limiter,
+                    [] if i < 3 else None,  # Log détaillé pour les 3 premières notices
+                    cache, client, learner, budget, network_count is None or i < network_count, cancel
+                )
+            pending.append((item, future, previous is None))
+            # Résultats déjà arrivés traités sans attendre la fin du flux,
+            # dans l'ordre des notices : progression et bilan identiques à
+            # un parcours séquentiel
+            while pending and pending[0][1].done() and not stopped():
+                record(done, *pending.popleft(), total)
+                done += 1
+        expected = done + len(pending)
+        while pending:
+            if not ready(pending[0][1]):
+                cancelled = True
+                break
+            record(done, *pending.popleft(), expected)
+            done += 1
+    except BaseException:
+        # Lecture interrompue : les requêtes pas encore parties sont abandonnées
+        cancelled = True
+        raise
+    finally:
+        if cancelled:
+            # Annulation : les requêtes pas encore parties sont abandonnées ; celles en
+            # cours, dont les réponses sont ignorées sans toucher au cache, sont
+            # attendues OAI_CANCEL_JOIN_SECONDS au plus
+            pool.shutdown(wait=False, cancel_futures=True)
+            wait([future for _, future, _ in pending if not future.cancelled()], timeout=OAI_CANCEL_JOIN_SECONDS)
+        else:
+            pool.shutdown(wait=True)
+        if journal is not None:
+            journal.commit()
+    
+    if cancelled:
+        log(f"Enrichissement annulé: {done} notices traitées" + (f" sur {total}" if total is not None else "")
+            + (" - réponses conservées pour la reprise" if journal is not None else ""), "WARNING")
+    log("", "INFO")
+    log("=== Bilan OAI-PMH ===", "INFO")
+    log(f"Titres récupérés: {success_count} / {done}", "SUCCESS" if success_count > 0 else "WARNING")
+    if resumed_count:
+        log(f"Réponses reprises du journal d'une extraction interrompue: {resumed_count}", "INFO")
+    if cache is not None:
+        log(f"Réponses lues dans le cache local: {cache.hits} / {cache.hits + cache.misses}", "INFO")
+    for line in client.timing_report():
+        log(line, "INFO")
+    client.close()
+    for family, prefix in learner.summary().items():
+        log(f"Format retenu pour {family}: {prefix}", "INFO")
+    if store is not None:
+        store.save_prefix_stats(learner.stats)
+    if no_record_count > 0:
+        log(f"Non trouvés dans OAI: {no_record_count}", "WARNING")
+    if deferred_count > 0:
+        log(f"Notices différées (hors budget, absentes du cache): {deferred_count} - "
+            f"{answered_visits / max(total_visits, 1) * 100:.1f} % des visites couvertes ; "
+            f"une prochaine exécution les complétera", "WARNING")
+    if error_count > 0:
+        log(f"Erreurs/Sans métadonnées: {error_count}", "WARNING")
+        if error_count > done * 0.5:
+            log("", "INFO")
+            log("💡 Beaucoup d'erreurs réseau ? Décochez 'Récupérer les métadonnées'", "INFO")
+            log("   pour générer l'Excel sans titres (stats Matomo uniquement).", "INFO")
+    
+    # Enrichir les composantes avec le titre de leur notice parente
+    if components and total is not None:
+        propagate_titles(notices, components, log)
+    
+    return {
+        'titles': success_count,
+        'absent': no_record_count,
+        'errors': error_count,
+        'deferred': deferred_count,
+        'coverage_pct': round(answered_visits / max(total_visits, 1) * 100, 1),
+        'cache_hits': cache.hits if cache is not None else 0,
+        'resumed': resumed_count,
+        **client.stats(),
+    }
@@ -0,0 +1,213 @@
+"""Cache des lectures d'exports Matomo : notices et composantes agrégées, par contenu
+
+Le résultat de la lecture (compteurs Matomo et identifiants, sans métadonnées
+OAI-PMH) est enregistré en pickle (protocole 5) sous l'empreinte SHA-256 du
+contenu des fichiers lus, puis relu par projection mémoire (mmap). Un index
+(chemin, taille, date de modification -> empreinte) évite de relire un fichier
+inchangé pour le reconnaître : relancer une extraction, ou extraire après
+l'aperçu, ne coûte plus que le chargement du cache. Une lecture faite avec
+d'autres règles (version de l'application, tables de classify) est refaite.
+"""
+
+import gc
+import os
+import json
+import mmap
+import pickle
+import hashlib
+import operator
+from dataclasses import fields
+
+from . import __version__, classify
+from .oai import get_app_dir
+from .parsing import MatomoStats, Notice, Component
+
+PARSE_CACHE_DIRNAME = "cache_lecture"
+PARSE_CACHE_MAX_MB = 1024  # Au-delà, les lectures les moins récemment utilisées sont supprimées
+PICKLE_PROTOCOL = 5
+HASH_CHUNK_SIZE = 1 << 20
+
+# Champs issus de la lecture (les métadonnées OAI-PMH, ajoutées ensuite, ne sont pas conservées)
+STATS_FIELDS = tuple(f.name for f in fields(MatomoStats))
+NOTICE_FIELDS = STATS_FIELDS + ('ark', 'ark_id', 'naan', 'url', 'type')
+COMPONENT_FIELDS = STATS_FIELDS + ('ark_notice', 'component_id', 'url', 'type')
+
+
+def rules_digest():
+    """Empreinte des règles de lecture : version de l'application et tables de classify
+    (types, préfixes de composantes, motifs), dont dépendent les types et composantes en cache"""
+    rules = (
+        __version__,
+        classify.ARK_TYPE_RULES, classify.ARK_TYPE_DEFAULT,
+        classify.COMPONENT_TYPE_RULES, classify.COMPONENT_TYPE_PAGE, classify.COMPONENT_TYPE_DEFAULT,
+        classify.URL_COMPONENT_PREFIXES, classify.LABEL_COMPONENT_PREFIXES, classify.LABEL_NOTICE_PREFIXES,
+        sorted(classify.LABEL_IGNORED),  # Ordre d'un frozenset variable d'un processus à l'autre
+        classify.PAGE_ID_PATTERN, classify.UNKNOWN_PARENT_ARK, classify.SITE_URL,
+        classify.URL_ARK_PATTERN.pattern, classify.SEGMENT_ARK_PATTERN.pattern,
+        classify.LOCALE_SUFFIX_PATTERN.pattern, classify.URL_SUFFIX_PATTERN.pattern,
+    )
+    return hashlib.sha256(repr(rules).encode()).hexdigest()
+
+
+PARSE_RULES_DIGEST = rules_digest()
+
+
+def build_rows(cls, names, rows):
+    """Instances de cls reconstruites depuis des tuples de valeurs (champs names) ;
+    les autres champs reçoivent leur valeur par défaut"""
+    return [cls(**dict(zip(names, values))) for values in rows]
+
+
+def file_digest(path):
+    """Empreinte SHA-256 du contenu d'un fichier"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """Lectures déjà faites, dans un dossier à côté de l'application
+
+    fingerprint(paths) donne la clé d'un jeu de fichiers (lue dans l'index pour
+    les fichiers de même taille et date) ; load et save lisent et écrivent le
+    résultat de la lecture sous cette clé.
+    """
+
+    def __init__(self, directory=None, max_mb=PARSE_CACHE_MAX_MB):
+        self.directory = directory or os.path.join(get_app_dir(), PARSE_CACHE_DIRNAME)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.index_path = os.path.join(self.directory, "index.json")
+
+    def read_index(self):
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_index(self, index):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def fingerprint(self, paths):
+        """Empreinte du contenu des fichiers (dans l'ordre) ; seuls les fichiers
+        nouveaux ou modifiés (taille, date) sont relus"""
+        index = self.read_index()
+        digests = []
+        changed = False
+        for path in paths:
+            path = os.path.abspath(path)
+            st = os.stat(path)
+            entry = index.get(path)
+            if entry is not None and entry[:2] == [st.st_size, st.st_mtime_ns]:
+                digests.append(entry[2])
+                continue
+            digest = file_digest(path)
+            index[path] = [st.st_size, st.st_mtime_ns, digest]
+            digests.append(digest)
+            changed = True
+        if changed:
+            try:
+                self.write_index({p: e for p, e in index.items() if os.path.exists(p)})
+            except OSError:
+                pass  # Dossier en lecture seule : l'empreinte sera recalculée la prochaine fois
+        if len(digests) == 1:
+            return digests[0]
+        return hashlib.sha256("\n".join(digests).encode()).hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key + ".pickle")
+
+    def load(self, key):
+        """(notices, composantes) enregistrées sous key, None si absentes ou illisibles"""
+        path = self.entry_path(key)
+        # Des centaines de milliers d'objets sans cycle : le ramasse-miettes
+        # n'aurait rien à collecter mais se déclencherait à répétition
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                payload = pickle.loads(data)
+            # Champs ou règles de lecture d'une autre version de l'application : lecture à refaire
+            if (payload.get('fields') != (NOTICE_FIELDS, COMPONENT_FIELDS)
+                    or payload.get('rules') != PARSE_RULES_DIGEST):
+                self.discard(path)
+                return None
+            notices = build_rows(Notice, NOTICE_FIELDS, payload['notices'])
+            components = build_rows(Component, COMPONENT_FIELDS, payload['components'])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError, AttributeError, pickle.UnpicklingError, EOFError):
+            self.discard(path)
+            return None
+        finally:
+            if gc_enabled:
+                gc.enable()
+        try:
+            os.utime(path)  # Récemment utilisée : conservée en priorité à l'éviction
+        except OSError:
+            pass
+        return notices, components
+
+    def save(self, key, notices, components):
+        """Enregistre le résultat d'une lecture (écriture atomique), puis évince au-delà de max_mb"""
+        payload = {
+            'fields': (NOTICE_FIELDS, COMPONENT_FIELDS),
+            'rules': PARSE_RULES_DIGEST,
+            'notices': list(map(operator.attrgetter(*NOTICE_FIELDS), notices)),
+            'components': list(map(operator.attrgetter(*COMPONENT_FIELDS), components)),
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.entry_path(key)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(payload, f, protocol=PICKLE_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+        return path
+
+    def discard(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def evict(self):
+        """Supprime les lectures les moins récemment utilisées au-delà de la taille maximale"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".pickle"):
+                st = os.stat(os.path.join(self.directory, name))
+                entries.append((st.st_mtime, st.st_size, name))
+        total = 0
+        for _, size, name in sorted(entries, reverse=True):
+            total += size
+            if total > self.max_bytes:
+                self.discard(os.path.join(self.directory, name))
+
+
+def cached_parse(xml_paths, parse, cache=None, log=None):
+    """Résultat de parse() pour ces fichiers, depuis le cache si leur contenu est connu
+
+    parse : fonction sans argument lisant les fichiers, appelée sinon (son
+    résultat est alors mis en cache). Un cache illisible ou impossible à écrire
+    n'empêche pas la lecture. Retourne (notices, composantes, empreinte, lu en cache).
+    """
+    log = log or (lambda message, level="INFO": None)
+    cache = cache or ParseCache()
+    key = cache.fingerprint(xml_paths)
+    cached = cache.load(key)
+    if cached is not None:
+        log(f"Lecture reprise du cache (contenu inchangé): {len(cached[0])} notices", "SUCCESS")
+        return *cached, key, True
+    notices, components = parse()
+    try:
+        cache.save(key, notices, components)
+    except OSError as e:
+        log(f"Cache de lecture non écrit: {e}", "WARNING")
+    return notices, components, key, False
@@ -0,0 +1,304 @@
+"""
+Lecture des exports XML Matomo : notices ARK agrégées et composantes
+"""
+
+import os
+import sys
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+
+from .classify import (
+    UNKNOWN_PARENT_ARK, classify_url, classify_segment, classify_label, is_label_component, component_type,
+)
+
+
+def to_int(value):
+    """Convertit un compteur Matomo (texte) en entier, 0 si vide ou invalide"""
+    try:
+        return int(value or 0)
+    except ValueError:
+        return 0
+
+
+@dataclass(slots=True, kw_only=True)
+class MatomoStats:
+    """Statistiques Matomo d'une ligne, compteurs convertis en entiers à la lecture"""
+    nb_visits: int = 0
+    nb_uniq_visitors: int = 0  # 0 = non renseigné
+    nb_hits: int = 0
+    sum_time_spent: int = 0
+    avg_time_on_page: str = ''  # Format texte "00:01:23"
+    bounce_rate: str = ''  # Format texte "45 %"
+    exit_rate: str = ''  # Format texte "30 %"
+    entry_nb_visits: int = 0
+    entry_bounce_count: int = 0
+    exit_nb_visits: int = 0
+
+
+@dataclass(slots=True, kw_only=True)
+class Notice(MatomoStats):
+    """Notice ARK agrégée (pf..., FRCGM...) avec ses métadonnées OAI-PMH"""
+    ark: str
+    ark_id: str
+    naan: str
+    url: str
+    type: str
+    titre: str = ''
+    auteur: str = ''
+    contributeur: str = ''
+    date: str = ''
+    editeur: str = ''
+    description: str = ''
+    bibliotheque: str = ''
+    cote: str = ''
+    type_oai: str = ''
+    sujet: str = ''
+    format_doc: str = ''
+    langue: str = ''
+    droits: str = ''
+    relation: str = ''
+    statut_oai: str = ''  # Réponse OAI-PMH (ok, absent, erreur, différée), vide sans enrichissement
+
+
+@dataclass(slots=True, kw_only=True)
+class Component(MatomoStats):
+    """Composante/vue d'une notice (BAP..., BHP..., pages numérisées)"""
+    ark_notice: str
+    component_id: str
+    url: str
+    type: str = ''  # Type de composante (component_type), fixé à la lecture
+    titre_notice: str = ''
+
+
+def aggregate_xml(xml_path, on_notice=None):
+    """Lit un fichier XML Matomo en flux (iterparse) et agrège ses lignes par ARK
+    
+    Retourne l'agrégat partiel (notices par ARK, ordre de première ligne par ARK,
+    composantes (ordre, composante) dans l'ordre du document), à finaliser avec
+    finalize_aggregate ou à fusionner avec ceux d'autres fichiers (merge_aggregates).
+    on_notice(notice) est appelé à la première ligne de chaque ARK, pendant la
+    lecture : ses compteurs ne sont définitifs qu'en fin de fichier.
+    """
+    # Notices agrégées à la volée par ARK unique (pf..., FRCGM...)
+    aggregated = {}
+    first_seq = {}  # ARK -> ordre de sa première ligne dans le document
+    # Composantes (BAP..., vues...) : couples (ordre dans le document, données),
+    # les <row> étant traitées à leur balise fermante
+    components = []
+    
+    def add_notice(seq, info, url, stats):
+        """Cumule les stats d'une ligne dans la notice de son ARK (info : ArkInfo)"""
+        ark_full = info.ark
+        notice = aggregated.get(ark_full)
+        if notice is None:
+            # La notice n'est créée qu'une fois par ARK
+            notice = aggregated[ark_full] = Notice(
+                ark=ark_full, ark_id=info.ark_id, naan=info.naan, url=url, type=info.notice_type
+            )
+            first_seq[ark_full] = seq
+            if on_notice is not None:
+                on_notice(notice)
+        
+        notice.nb_visits += stats['nb_visits']
+        notice.nb_hits += stats['nb_hits']
+        notice.sum_time_spent += stats['sum_time_spent']
+        # Visiteurs uniques: prendre le max (on ne peut pas les additionner)
+        if stats['nb_uniq_visitors'] > notice.nb_uniq_visitors:
+            notice.nb_uniq_visitors = stats['nb_uniq_visitors']
+        notice.entry_nb_visits += stats['entry_nb_visits']
+        notice.entry_bounce_count += stats['entry_bounce_count']
+        notice.exit_nb_visits += stats['exit_nb_visits']
+        
+        # URL et taux texte : ceux de la première ligne dans l'ordre du document
+        if seq <= first_seq[ark_full]:
+            first_seq[ark_full] = seq
+            notice.url = url
+            notice.avg_time_on_page = stats['avg_time_on_page']
+            notice.bounce_rate = stats['bounce_rate']
+            notice.exit_rate = stats['exit_rate']
+    
+    def extract_row(row, seq):
+        label = row.findtext('label', '')
+        url_elem = row.find('url')
+        url = url_elem.text if url_elem is not None else None
+        segment = row.findtext('segment', '')
+        
+        # Données Matomo
+        stats = {
+            'nb_visits': to_int(row.findtext('nb_visits')),
+            'nb_uniq_visitors': to_int(row.findtext('nb_uniq_visitors') or row.findtext('sum_daily_nb_uniq_visitors')),
+            'nb_hits': to_int(row.findtext('nb_hits')),
+            'sum_time_spent': to_int(row.findtext('sum_time_spent')),
+            'avg_time_on_page': row.findtext('avg_time_on_page', ''),
+            'bounce_rate': row.findtext('bounce_rate', ''),
+            'exit_rate': row.findtext('exit_rate', ''),
+            'entry_nb_visits': to_int(row.findtext('entry_nb_visits')),
+            'entry_bounce_count': to_int(row.findtext('entry_bounce_count')),
+            'exit_nb_visits': to_int(row.findtext('exit_nb_visits')),
+        }
+        
+        # CAS 1: URL explicite avec ARK (notice, ou composante BAP.../0001/A... comptée aussi pour sa notice)
+        if url and '/ark:/' in url:
+            info = classify_url(url)
+            if info is not None:
+                if info.component_id is not None:
+                    components.append((seq, Component(
+                        ark_notice=info.ark, component_id=info.component_id, url=url,
+                        type=info.component_type, **stats
+                    )))
+                # Vues v0001/selectedTab comprises : agrégées par ARK
+                add_notice(seq, info, info.url, stats)
+        
+        # CAS 1bis: Pas d'URL mais ARK encodé dans le segment
+        elif not url and segment and 'ark%253A%252F' in segment:
+            info = classify_segment(segment)
+            if info is not None:
+                add_notice(seq, info, info.url, stats)
+        
+        # CAS 2: Label qui est un identifiant de notice (niveau 3 : pf..., FRCGM...)
+        elif label and not label.startswith('/'):
+            info = classify_label(label)
+            if info is not None:
+                add_notice(seq, info, info.url, stats)
+        
+        # CAS 3: Label qui est une composante (/BAP..., /BHP..., /0001...)
+        elif label:
+            comp_id = label[1:]  # Enlever le /
+            if is_label_component(comp_id):
+                # ARK parent reconstruit depuis le segment
+                parent = classify_segment(segment) if segment else None
+                components.append((seq, Component(
+                    ark_notice=parent.ark if parent is not None else UNKNOWN_PARENT_ARK,
+                    component_id=comp_id, url=url or '', type=component_type(comp_id), **stats
+                )))
+    
+    # Lecture en flux : chaque <row> est traitée dès sa balise fermante puis
+    # libérée, la mémoire ne dépend plus de la taille du fichier.
+    # Le numéro d'ordre est attribué à la balise ouvrante, comme findall('.//row').
+    parents = []  # Pile des éléments ouverts (pour détacher les <row> traitées)
+    row_seqs = []  # Pile des numéros d'ordre des <row> ouvertes
+    next_seq = 0
+    for event, elem in ET.iterparse(xml_path, events=('start', 'end')):
+        if event == 'start':
+            if elem.tag == 'row' and parents:
+                row_seqs.append(next_seq)
+                next_seq += 1
+            parents.append(elem)
+            continue
+        
+        parents.pop()
+        if elem.tag == 'row' and parents:
+            extract_row(elem, row_seqs.pop())
+            elem.clear()
+            parents[-1].remove(elem)
+    
+    # Rétablir l'ordre du document
+    components.sort(key=lambda x: x[0])
+    return aggregated, first_seq, components
+
+
+def merge_aggregates(partials, on_notice=None):
+    """Fusionne les agrégats partiels de plusieurs fichiers, pris dans l'ordre des fichiers
+    
+    Mêmes règles qu'à l'intérieur d'un fichier : visites, pages vues et temps
+    additionnés, visiteurs uniques au maximum ; URL et taux texte de la première
+    ligne. L'ordre (numéro de fichier, ordre dans le fichier) est celui de la
+    concaténation des documents : le résultat ne dépend pas du découpage en processus.
+    on_notice(notice) est appelé à la première apparition de chaque ARK.
+    """
+    aggregated = {}
+    first_seq = {}
+    components = []
+    for file_index, (partial, partial_seq, partial_components) in enumerate(partials):
+        for ark_full, other in partial.items():
+            notice = aggregated.get(ark_full)
+            if notice is None:
+                # Première apparition : la notice du fichier le plus ancien est reprise telle quelle
+                other.naan = sys.intern(other.naan)
+                aggregated[ark_full] = other
+                first_seq[ark_full] = (file_index, partial_seq[ark_full])
+                if on_notice is not None:
+                    on_notice(other)
+                continue
+            notice.nb_visits += other.nb_visits
+            notice.nb_hits += other.nb_hits
+            notice.sum_time_spent += other.sum_time_spent
+            if other.nb_uniq_visitors > notice.nb_uniq_visitors:
+                notice.nb_uniq_visitors = other.nb_uniq_visitors
+            notice.entry_nb_visits += other.entry_nb_visits
+            notice.entry_bounce_count += other.entry_bounce_count
+            notice.exit_nb_visits += other.exit_nb_visits
+        components.extend(((file_index, seq), comp) for seq, comp in partial_components)
+    return aggregated, first_seq, components
+
+
+def finalize_aggregate(aggregated, first_seq, components, log=None):
+    """Notices triées par visites décroissantes et composantes dans l'ordre du document"""
+    log = log or (lambda message, level="INFO": None)
+    components = [comp for _, comp in components]
+    
+    # Liste finale des notices, triée par visites
+    # (à égalité, ordre de première apparition dans le document)
+    result_notices = sorted(aggregated.values(), key=lambda n: (-n.nb_visits, first_seq[n.ark]))
+    
+    # Logger les top 5
+    log("Top 5 des notices les plus consultées:")
+    for i, item in enumerate(result_notices[:5], 1):
+        log(f"  #{i}: {item.ark_id} - {item.nb_visits} visites", "DATA")
+    
+    return result_notices, components
+
+
+def parse_xml(xml_path, log=None, on_notice=None):
+    """Parse le fichier XML Matomo et extrait les données ARK
+    
+    Retourne (notices triées par visites décroissantes, composantes).
+    on_notice(notice) reçoit chaque nouvel ARK dès sa première ligne (voir aggregate_xml).
+    """
+    log = log or (lambda message, level="INFO": None)
+    log("Parsing du fichier XML...")
+    return finalize_aggregate(*aggregate_xml(xml_path, on_notice), log=log)
+
+
+def aggregate_files(xml_paths, on_notice=None):
+    """Agrège et fusionne une suite de fichiers (travail d'un processus de parse_many)"""
+    return merge_aggregates(map(aggregate_xml, xml_paths), on_notice)
+
+
+def parse_many(xml_paths, max_workers=None, log=None, on_notice=None):
+    """Parse plusieurs exports Matomo en parallèle (pool de processus) et les fusionne
+    
+    Chaque processus agrège et fusionne une suite de fichiers consécutifs ; le
+    processus principal ne fusionne plus qu'un agrégat par suite. Le résultat est
+    celui d'une lecture séquentielle des fichiers dans l'ordre donné ;
+    max_workers=1 lit les fichiers dans le processus courant.
+    on_notice(notice) reçoit chaque nouvel ARK, fichier par fichier, dans le
+    processus courant (à la fusion).
+    """
+    log = log or (lambda message, level="INFO": None)
+    xml_paths = list(xml_paths)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(xml_paths)))
+    log(f"Parsing de {len(xml_paths)} fichiers XML ({max_workers} processus)...")
+    
+    if max_workers == 1:
+        merged = aggregate_files(xml_paths, on_notice)
+    else:
+        # Suites de fichiers consécutifs (2 par processus, pour équilibrer la charge) :
+        # l'ordre (suite, (fichier, ligne)) reste celui de la lecture séquentielle
+        size = -(-len(xml_paths) // (max_workers * 2))
+        chunks = [xml_paths[i:i + size] for i in range(0, len(xml_paths), size)]
+        
+        def logged(partials):
+            done = 0
+            for chunk, partial in zip(chunks, partials):
+                done += len(chunk)
+                log(f"  {done}/{len(xml_paths)} fichiers lus", "DATA")
+                yield partial
+        
+        # Les agrégats sont fusionnés au fil de l'eau, dans l'ordre des fichiers
+        from concurrent.futures import ProcessPoolExecutor  # multiprocessing, chargé seulement ici
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            merged = merge_aggregates(logged(pool.map(aggregate_files, chunks)), on_notice)
+    return finalize_aggregate(*merged, log=log)
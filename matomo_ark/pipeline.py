@@ -0,0 +1,389 @@
+"""Enchaînement des étapes d'extraction, indépendant de l'interface graphique
+
+parse -> enrich (OAI-PMH, facultatif) -> export, avec des callbacks log et
+progress : utilisé tel quel par la ligne de commande et par l'application.
+En mode pipelined, lecture et enrichissement se recouvrent : chaque nouvel ARK
+part vers les requêtes OAI-PMH pendant que la lecture continue.
+Chaque étape est mesurée (durée, débit, mémoire) pour le bilan de fin.
+L'enrichissement est noté dans un journal de reprise (EnrichmentJournal) et
+peut être annulé (cancel) ; relancée sur les mêmes fichiers, une extraction
+interrompue reprend là où elle s'était arrêtée. Le résultat de la lecture est
+mis en cache (ParseCache) : des fichiers inchangés ne sont pas relus.
+"""
+
+import os
+import time
+import queue
+import itertools
+import threading
+from datetime import datetime
+
+from .parsing import parse_xml, parse_many
+from .exporters import EXPORTERS, DEFAULT_FORMATS
+from .history import PeriodStore, check_period
+from .profiling import RunProfile
+from .checkpoint import EnrichmentJournal
+from .parse_cache import ParseCache, cached_parse
+from .oai import (
+    OAI_BASE_URL, OAI_MAX_WORKERS, OAI_REQUESTS_PER_SECOND,
+    OAICache, EnrichmentBudget, harvest_oai_records, enrich_notices, propagate_titles,
+)
+
+LOG_ICONS = {"INFO": "ℹ️", "SUCCESS": "✅", "ERROR": "❌", "WARNING": "⚠️", "PROGRESS": "🔄", "DATA": "📄"}
+
+
+class ExtractionCancelled(Exception):
+    """Extraction arrêtée à la demande (ExtractionPipeline.cancel)"""
+
+
+def format_log_message(message, level="INFO"):
+    """Ligne de journal horodatée, au format du journal de l'application"""
+    if level == "INFO" and message.startswith("ℹ️"):
+        # Déjà formaté
+        return message
+    if level == "INFO" and message == "":
+        return ""
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    return f"[{timestamp}] {LOG_ICONS.get(level, '')} {message}"
+
+
+def default_output_path(xml_path, extension=".xlsx"):
+    """Fichier de sortie horodaté, à côté du fichier XML"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(os.path.dirname(os.path.abspath(xml_path)), f"stats_matomo_ark_{timestamp}{extension}")
+
+
+class ExtractionPipeline:
+    """Extraction complète d'un export Matomo XML vers un ou plusieurs formats de sortie
+
+    xml_path : un fichier, ou une liste de fichiers lus en parallèle (jobs
+    processus) et fusionnés comme un seul export.
+    formats : noms de EXPORTERS ('xlsx', 'csv', 'parquet', 'sqlite'). Sans
+    output_path, les fichiers sont horodatés à côté du XML ; sinon ils reprennent
+    son nom avec l'extension de chaque format. Avec period ("AAAA-MM"), les
+    statistiques sont aussi ajoutées à l'historique (PeriodStore).
+    Les étapes sont mesurées dans profile (RunProfile) et résumées par finish().
+    report : rapport JSON à côté des sorties (nom_rapport.json) ; report_sheet :
+    feuille Performances dans le classeur Excel ; profile_mode ('cprofile' ou
+    'tracemalloc') : profilage de chaque étape, qui implique le rapport.
+    pipelined : les métadonnées sont demandées pendant la lecture (une seule
+    étape mesurée, parse_enrich). Les exports ne sont pas écrits au fil de
+    l'eau, CSV et SQLite compris : ils attendent la fin des deux, les compteurs
+    n'étant définitifs qu'en fin de fichier, les sorties triées par visites et
+    les titres reportés sur les composantes à la fin.
+    coverage (0.95 = 95 % des visites), top (notices), max_requests et
+    time_budget (s) : budget d'enrichissement (EnrichmentBudget), les notices
+    étant alors demandées par visites décroissantes après la lecture ; celles
+    restées hors budget sont marquées différées.
+    resume : les réponses OAI-PMH sont notées dans le journal de reprise, sous
+    l'empreinte des fichiers lus ; une extraction interrompue puis relancée ne
+    redemande que les notices restantes. Le journal est effacé après l'export.
+    cancel() (depuis un autre thread) arrête la lecture ou l'enrichissement en
+    moins d'une seconde : l'étape en cours lève ExtractionCancelled, les notices
+    lues et les métadonnées déjà obtenues restant dans notices.
+    parse_cache : lecture reprise du cache de lecture si le contenu des fichiers
+    est connu, mise en cache sinon.
+    """
+
+    def __init__(self, xml_path, output_path=None, formats=DEFAULT_FORMATS, fetch_metadata=True, use_cache=True,
+                 harvest=False, base_url=OAI_BASE_URL, max_workers=OAI_MAX_WORKERS,
+                 requests_per_second=OAI_REQUESTS_PER_SECOND, period=None, history_path=None,
+                 jobs=None, report=False, report_sheet=False, profile_mode=None, pipelined=False,
+                 coverage=None, top=None, max_requests=None, time_budget=None, resume=True,
+                 parse_cache=True, log=None, progress=None):
+        self.xml_paths = [xml_path] if isinstance(xml_path, (str, os.PathLike)) else list(xml_path)
+        self.xml_path = self.xml_paths[0]
+        self.jobs = jobs
+        self.output_path = output_path
+        unknown = [f for f in formats if f not in EXPORTERS]
+        if unknown or not formats:
+            raise ValueError(f"Format(s) de sortie inconnu(s): {', '.join(unknown) or 'aucun'} "
+                             f"(disponibles: {', '.join(EXPORTERS)})")
+        self.formats = tuple(dict.fromkeys(formats))  # Sans doublons, dans l'ordre demandé
+        self.fetch_metadata = fetch_metadata
+        self.use_cache = use_cache
+        self.harvest = harvest
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self.requests_per_second = requests_per_second
+        self.period = check_period(period) if period else None
+        self.history_path = history_path
+        self.report = report or profile_mode is not None
+        self.report_sheet = report_sheet
+        self.pipelined = pipelined
+        self.budget_limits = dict(coverage=coverage, max_notices=top, max_requests=max_requests,
+                                  max_seconds=time_budget)
+        if any(value is not None for value in self.budget_limits.values()):
+            EnrichmentBudget(**self.budget_limits)  # Valeurs vérifiées dès la création
+        else:
+            self.budget_limits = None
+        self.resume = resume
+        self.parse_cache = parse_cache
+        self.input_key = None  # Empreinte des fichiers lus, une fois le journal de reprise ouvert
+        self.cancelled = threading.Event()
+        self.log = log or (lambda message, level="INFO": None)
+        self.progress = progress or (lambda value, text: None)
+        
+        self.profile = RunProfile(profile_mode)
+        self.profile.info.update(source=self.source_name(), formats=list(self.formats),
+                                 metadata=fetch_metadata, pipelined=pipelined)
+        self.output_base = None  # Chemin des sorties sans extension, fixé à l'export
+
+        self.notices = []
+        self.components = []
+
+    def source_name(self):
+        """Nom du ou des fichiers lus, pour le résumé et l'historique"""
+        if len(self.xml_paths) == 1:
+            return os.path.basename(self.xml_path)
+        return f"{len(self.xml_paths)} fichiers ({os.path.basename(self.xml_path)}...)"
+
+    def cancel(self):
+        """Demande l'arrêt de l'extraction (appelable depuis un autre thread)"""
+        self.cancelled.set()
+
+    def check_cancelled(self):
+        if self.cancelled.is_set():
+            raise ExtractionCancelled("Extraction annulée")
+
+    def read(self, stage, on_notice=None):
+        """Lecture des fichiers XML, mesurée dans stage ; on_notice reçoit chaque nouvel ARK"""
+        def arrived(notice):
+            self.check_cancelled()  # Annulation prise en compte à chaque nouvel ARK
+            if on_notice is not None:
+                on_notice(notice)
+
+        def parse():
+            if len(self.xml_paths) == 1:
+                return parse_xml(self.xml_path, log=self.log, on_notice=arrived)
+            return parse_many(self.xml_paths, self.jobs, log=self.log, on_notice=arrived)
+
+        if self.parse_cache:
+            self.notices, self.components, self.input_key, from_cache = cached_parse(
+                self.xml_paths, parse, log=self.log)
+            stage.extra['parse_cache'] = 'lu' if from_cache else 'écrit'
+            if from_cache:
+                for notice in self.notices:  # En mode pipelined, toutes partent aussitôt
+                    arrived(notice)
+        else:
+            self.notices, self.components = parse()
+        stage.rows = len(self.notices) + len(self.components)
+        stage.extra['files'] = len(self.xml_paths)
+        stage.extra['input_mb'] = round(sum(os.path.getsize(p) for p in self.xml_paths) / 1024 / 1024, 1)
+
+    def parse(self):
+        """1. Lecture du fichier XML"""
+        self.progress(0.1, "Analyse du fichier XML...")
+        with self.profile.stage('parse') as stage:
+            self.read(stage)
+        self.log_counts()
+        return self.notices, self.components
+
+    def log_counts(self):
+        if self.notices:
+            self.log(f"Trouvé {len(self.notices)} notices ARK uniques", "SUCCESS")
+            if self.components:
+                self.log(f"Trouvé {len(self.components)} composantes/vues", "SUCCESS")
+        else:
+            self.log("Aucune donnée ARK trouvée dans le fichier", "ERROR")
+
+    def open_journal(self):
+        """Journal de reprise des fichiers lus (None sans resume)"""
+        if not self.resume:
+            return None
+        if self.input_key is None:
+            self.input_key = ParseCache().fingerprint(self.xml_paths)
+        return EnrichmentJournal(self.input_key, source=self.source_name())
+
+    def clear_journal(self):
+        """Efface le journal de reprise une fois les sorties écrites"""
+        if self.input_key is None:
+            return
+        journal = EnrichmentJournal(self.input_key)
+        try:
+            journal.clear()
+        finally:
+            journal.close()
+
+    def open_oai_store(self):
+        """Base locale OAI-PMH et cache à utiliser (None si les réponses en cache sont ignorées)
+
+        Le moissonnage demandé est fait ici, avant toute requête GetRecord.
+        """
+        # La base locale conserve les formats appris ; ses réponses en cache ne
+        # sont utilisées que si demandé (le moissonnage implique le cache)
+        store = OAICache()
+        cache = store if self.use_cache or self.harvest else None
+        if self.harvest:
+            self.progress(0.2, "Moissonnage du catalogue (ListRecords)...")
+            try:
+                with self.profile.stage('harvest') as stage:
+                    stage.rows = harvest_oai_records(cache, base_url=self.base_url, log=self.log)
+            except BaseException:
+                store.close()
+                raise
+        return store, cache
+
+    def enrich_stream(self, notices, components, store, cache, budget=None, journal=None):
+        """Appel de enrich_notices avec les réglages de l'extraction ; renvoie ses compteurs"""
+        return enrich_notices(
+            notices, components, log=self.log, progress=self.progress,
+            base_url=self.base_url, max_workers=self.max_workers,
+            requests_per_second=self.requests_per_second, cache=cache, store=store, budget=budget,
+            journal=journal, cancel=self.cancelled
+        )
+
+    def enrich(self):
+        """2. Récupération des métadonnées via OAI-PMH"""
+        if not self.fetch_metadata:
+            return
+        self.progress(0.2, "Récupération des métadonnées via OAI-PMH...")
+        journal = self.open_journal()
+        try:
+            store, cache = self.open_oai_store()
+            try:
+                budget = EnrichmentBudget(**self.budget_limits) if self.budget_limits else None
+                with self.profile.stage('enrich') as stage:
+                    stage.extra.update(self.enrich_stream(self.notices, self.components, store, cache,
+                                                          budget, journal))
+                    stage.rows = len(self.notices)
+            finally:
+                store.close()
+        finally:
+            if journal is not None:
+                journal.close()
+        self.check_cancelled()
+
+    def parse_and_enrich(self):
+        """1-2. Lecture puis métadonnées, en recouvrement en mode pipelined
+
+        Chaque nouvel ARK rencontré par la lecture est mis en file ; un thread
+        d'enrichissement le demande aussitôt (enrich_notices en flux). Les
+        titres sont reportés sur les composantes une fois la lecture terminée.
+        Renvoie (notices, composantes) comme parse.
+        """
+        if self.pipelined and self.fetch_metadata and self.budget_limits:
+            # Le budget suit les visites, connues en fin de lecture seulement
+            self.log("Budget d'enrichissement : métadonnées demandées après la lecture", "INFO")
+        if not (self.pipelined and self.fetch_metadata) or self.budget_limits:
+            self.parse()
+            self.check_cancelled()
+            if self.notices:
+                self.enrich()
+            return self.notices, self.components
+
+        self.progress(0.1, "Analyse du fichier XML et récupération des métadonnées...")
+        journal = self.open_journal()
+        try:
+            store, cache = self.open_oai_store()
+        except BaseException:
+            if journal is not None:
+                journal.close()
+            raise
+        arrivals = queue.Queue()  # Notices nouvelles, puis None en fin de lecture
+        outcome = {}  # Compteurs de l'enrichissement, ou son exception
+
+        def stream():
+            while (notice := arrivals.get()) is not None:
+                if isinstance(notice, BaseException):
+                    raise notice  # Lecture en échec : les requêtes en attente sont abandonnées
+                yield notice
+
+        def consume():
+            notices = stream()
+            try:
+                first = next(notices, None)
+                if first is not None:  # Pas de requête pour un fichier sans ARK
+                    outcome['stats'] = self.enrich_stream(itertools.chain((first,), notices), None, store, cache,
+                                                          journal=journal)
+            except BaseException as e:
+                outcome['error'] = e
+
+        try:
+            with self.profile.stage('parse_enrich') as stage:
+                worker = threading.Thread(target=consume, name="enrichissement-oai", daemon=True)
+                worker.start()
+                try:
+                    started = time.perf_counter()
+                    self.read(stage, on_notice=arrivals.put)
+                    stage.extra['parse_s'] = round(time.perf_counter() - started, 3)
+                except BaseException as e:
+                    arrivals.put(e)
+                    raise
+                finally:
+                    arrivals.put(None)
+                    worker.join()
+                if 'error' in outcome:
+                    raise outcome['error']
+                stage.extra.update(outcome.get('stats', {}))
+        finally:
+            store.close()
+            if journal is not None:
+                journal.close()
+        self.log_counts()
+        propagate_titles(self.notices, self.components, self.log)
+        self.check_cancelled()
+        return self.notices, self.components
+
+    def record_history(self):
+        """Ajout (ou remplacement) de la période dans l'historique"""
+        if not self.period:
+            return
+        with self.profile.stage('history') as stage:
+            store = PeriodStore(self.history_path)
+            try:
+                count = stage.rows = store.ingest(self.period, self.notices, source=self.source_name())
+            finally:
+                store.close()
+        self.log(f"Historique: période {self.period} enregistrée ({count} notices)", "SUCCESS")
+
+    def export(self):
+        """3. Écriture des fichiers de sortie ; renvoie la liste des fichiers créés"""
+        # Même nom de base (et même horodatage) pour tous les formats
+        base = self.output_base = os.path.splitext(self.output_path or default_output_path(self.xml_path))[0]
+        paths = []
+        for name in self.formats:
+            exporter = EXPORTERS[name]
+            self.progress(0.9, f"Génération des fichiers ({exporter.description})...")
+            # Feuille Performances : étapes terminées avant cet export
+            report = self.profile.to_dict() if self.report_sheet else None
+            with self.profile.stage(f'export_{name}') as stage:
+                written = exporter.write(
+                    self.notices, self.components, base + exporter.extension,
+                    source_name=self.source_name(),
+                    metadata_enabled=self.fetch_metadata, log=self.log, report=report
+                )
+                stage.rows = len(self.notices) + len(self.components)
+            for path in written:
+                self.log(f"Fichier généré: {os.path.basename(path)}", "SUCCESS")
+                paths.append(path)
+        self.clear_journal()
+        self.progress(1.0, "Terminé !")
+        return paths
+    
+    def finish(self):
+        """Bilan des durées dans le journal ; écrit le rapport demandé et renvoie ses fichiers"""
+        self.log("", "INFO")
+        self.log("=== Durées des étapes ===", "INFO")
+        for line in self.profile.summary():
+            self.log(line, "INFO")
+        if not self.report:
+            return []
+        
+        base = self.output_base or os.path.splitext(self.output_path or default_output_path(self.xml_path))[0]
+        self.profile.info.update(notices=len(self.notices), components=len(self.components))
+        paths = [self.profile.write_json(base + "_rapport.json")]
+        profile_path = self.profile.dump_profile(base + "_profil.prof")
+        if profile_path:
+            paths.append(profile_path)
+        for path in paths:
+            self.log(f"Rapport généré: {os.path.basename(path)}", "SUCCESS")
+        return paths
+
+    def run(self):
+        """Enchaîne les trois étapes ; renvoie les fichiers créés, ou None sans données"""
+        self.log("Démarrage de l'extraction...", "PROGRESS")
+        if not self.parse_and_enrich()[0]:
+            return None
+        self.record_history()
+        return self.export() + self.finish()
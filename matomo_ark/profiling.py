@@ -0,0 +1,257 @@
+"""Mesures des étapes d'une extraction : durées, débit, mémoire
+
+Chaque étape (lecture, moisson, enrichissement, historique, export par format)
+est mesurée par RunProfile.stage : durée réelle et temps CPU, lignes traitées,
+pic de mémoire résidente et compteurs propres à l'étape (requêtes, latences,
+reprises). Le rapport s'écrit en JSON et peut être ajouté au classeur Excel
+(feuille Performances). En mode 'cprofile' ou 'tracemalloc', chaque étape est
+aussi profilée (fonctions les plus coûteuses ou lignes qui allouent le plus).
+"""
+
+import os
+import sys
+import json
+import time
+from dataclasses import dataclass, field
+from contextlib import contextmanager
+
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+PROFILE_TOP = 15  # Fonctions ou lignes d'allocation retenues par étape
+
+STAGE_LABELS = {
+    'parse': "Lecture XML",
+    'harvest': "Moissonnage OAI-PMH",
+    'enrich': "Métadonnées OAI-PMH",
+    'parse_enrich': "Lecture XML + métadonnées (en parallèle)",
+    'history': "Historique",
+}
+
+
+def stage_label(name):
+    """Nom affiché d'une étape (export_xlsx -> Export XLSX)"""
+    if name.startswith('export_'):
+        return f"Export {name[len('export_'):].upper()}"
+    return STAGE_LABELS.get(name, name)
+
+
+def short_path(filename):
+    """Dossier parent et nom du fichier (matomo_ark/parsing.py), pour les rapports"""
+    return "/".join(filename.replace("\\", "/").split("/")[-2:])
+
+
+def _windows_peak_rss():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+            (name, ctypes.c_size_t) for name in (
+                'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+                'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize / 1024 / 1024
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus (Mo), None si inconnu"""
+    if sys.platform == 'win32':
+        try:
+            return _windows_peak_rss()
+        except (OSError, AttributeError):
+            return None
+    try:
+        with open('/proc/self/status') as f:  # Linux : VmHWM, remis à zéro par reset_peak_rss
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def reset_peak_rss():
+    """Ramène le pic de mémoire au niveau actuel (Linux) pour mesurer une étape seule"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass  # Ailleurs, le pic reste celui du processus depuis son lancement
+
+
+def cpu_seconds():
+    """Temps CPU du processus et de ses processus enfants terminés (lecture parallèle)"""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """Percentiles (rang le plus proche) d'une liste de durées en secondes, en ms"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    return {f"p{p}": round(ordered[min(last, max(0, -(-p * len(ordered) // 100) - 1))] * 1000, 1)
+            for p in points}
+
+
+@dataclass(slots=True)
+class StageProfile:
+    """Mesures d'une étape ; extra reçoit les compteurs propres à l'étape"""
+    name: str
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    rows: int | None = None
+    peak_rss_mb: float | None = None
+    extra: dict = field(default_factory=dict)
+
+    @property
+    def rows_per_s(self):
+        if self.rows is None or self.wall_s <= 0:
+            return None
+        return self.rows / self.wall_s
+
+    def to_dict(self):
+        rate = self.rows_per_s
+        return {
+            'label': stage_label(self.name),
+            'wall_s': round(self.wall_s, 3),
+            'cpu_s': round(self.cpu_s, 3),
+            'rows': self.rows,
+            'rows_per_s': round(rate, 1) if rate is not None else None,
+            'peak_rss_mb': round(self.peak_rss_mb, 1) if self.peak_rss_mb is not None else None,
+            **self.extra,
+        }
+
+
+class RunProfile:
+    """Mesures des étapes d'une exécution, dans l'ordre où elles ont tourné
+
+    mode : None (mesures seules), 'cprofile' (fonctions les plus coûteuses de
+    chaque étape, thread appelant seulement) ou 'tracemalloc' (allocations
+    Python, qui ralentit nettement l'exécution). info reçoit le contexte de
+    l'exécution (fichier source, formats...) repris dans le rapport.
+    """
+
+    def __init__(self, mode=None):
+        if mode is not None and mode not in PROFILE_MODES:
+            raise ValueError(f"Mode de profilage inconnu: {mode} (disponibles: {', '.join(PROFILE_MODES)})")
+        self.mode = mode
+        self.started = time.time()
+        self.info = {}
+        self.stages = {}
+        self.profiler_stats = None  # pstats.Stats cumulées de toutes les étapes (mode cprofile)
+
+    @contextmanager
+    def stage(self, name):
+        """Mesure le bloc ; fournit le StageProfile à compléter (rows, extra)"""
+        stage = StageProfile(name)
+        profiler = None
+        if self.mode == 'cprofile':
+            import cProfile
+            profiler = cProfile.Profile()
+        elif self.mode == 'tracemalloc':
+            import tracemalloc
+            tracemalloc.start()
+        reset_peak_rss()
+        start_wall, start_cpu = time.perf_counter(), cpu_seconds()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield stage
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            stage.wall_s = time.perf_counter() - start_wall
+            stage.cpu_s = cpu_seconds() - start_cpu
+            stage.peak_rss_mb = peak_rss_mb()
+            if profiler is not None:
+                self._add_cprofile(stage, profiler)
+            elif self.mode == 'tracemalloc':
+                self._add_tracemalloc(stage)
+            self.stages[name] = stage
+
+    def _add_cprofile(self, stage, profiler):
+        import pstats
+        stats = pstats.Stats(profiler)
+        stats.sort_stats('cumulative')
+        functions = []
+        for key in stats.fcn_list[:PROFILE_TOP]:
+            filename, line, func = key
+            _, calls, _, cumulative, _ = stats.stats[key]
+            functions.append({'function': f"{func} ({short_path(filename)}:{line})", 'calls': calls,
+                              'cumulative_s': round(cumulative, 3)})
+        stage.extra['functions'] = functions
+        if self.profiler_stats is None:
+            self.profiler_stats = stats
+        else:
+            self.profiler_stats.add(stats)
+
+    def _add_tracemalloc(self, stage):
+        import tracemalloc
+        snapshot = tracemalloc.take_snapshot()
+        stage.extra['python_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+        tracemalloc.stop()
+        stage.extra['allocations'] = [
+            {'line': f"{short_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+             'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+            for stat in snapshot.statistics('lineno')[:PROFILE_TOP]
+        ]
+
+    def total_seconds(self):
+        return sum(stage.wall_s for stage in self.stages.values())
+
+    def to_dict(self):
+        import platform
+        from . import __version__
+        return {
+            'version': __version__,
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'mode': self.mode,
+            **self.info,
+            'total_s': round(self.total_seconds(), 3),
+            'stages': {name: stage.to_dict() for name, stage in self.stages.items()},
+        }
+
+    def summary(self):
+        """Lignes du bilan des durées, pour le journal"""
+        lines = []
+        for stage in self.stages.values():
+            line = f"{stage_label(stage.name)}: {stage.wall_s:.2f} s (CPU {stage.cpu_s:.2f} s)"
+            if stage.rows_per_s is not None:
+                rate = f"{stage.rows_per_s:,.0f}".replace(',', ' ')
+                line += f", {stage.rows} lignes ({rate}/s)"
+            if stage.peak_rss_mb is not None:
+                line += f", pic mémoire {stage.peak_rss_mb:.0f} Mo"
+            lines.append(line)
+            latency = stage.extra.get('latency_ms')
+            if latency:
+                lines.append("  Latence des requêtes: " + ", ".join(f"{p} {ms:.0f} ms" for p, ms in latency.items())
+                             + f" - reprises: {stage.extra.get('retries', 0)}"
+                             + f", nouveaux essais: {stage.extra.get('retried', 0)}")
+        lines.append(f"Durée totale: {self.total_seconds():.2f} s")
+        return lines
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        return path
+
+    def dump_profile(self, path):
+        """Profil cProfile cumulé (lisible avec pstats ou snakeviz), None hors mode cprofile"""
+        if self.profiler_stats is None:
+            return None
+        self.profiler_stats.dump_stats(path)
+        return path
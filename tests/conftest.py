@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+@pytest.fixture
+def export_path():
+    """Petit export Matomo couvrant les cas de lecture (URL, .locale, vues, segment, libellés)"""
+    return os.path.join(DATA_DIR, "export_matomo.xml")
+
+
+@pytest.fixture
+def export_path_2():
+    """Second export : mêmes ARK en partie (fusion de plusieurs fichiers)"""
+    return os.path.join(DATA_DIR, "export_matomo_2.xml")
+
+
+@pytest.fixture
+def read_data():
+    """Contenu (texte) d'un fichier de tests/data"""
+    def read(name):
+        with open(os.path.join(DATA_DIR, name), encoding="utf-8") as f:
+            return f.read()
+    return read
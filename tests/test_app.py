@@ -0,0 +1,102 @@
+import queue
+
+import pytest
+
+pytest.importorskip("customtkinter")
+
+import app  # noqa: E402
+
+
+def message(line):
+    """Message d'une ligne de journal, sans horodatage ni icône"""
+    return line.split("] ", 1)[-1].split(" ", 1)[-1]
+
+
+class FakeTextbox:
+    """Zone de texte réduite à ce qu'utilise le journal (insertion, suppression des premières lignes)"""
+
+    def __init__(self, timeline):
+        self.lines = []
+        self.timeline = timeline
+
+    def insert(self, index, text):
+        for line in text.splitlines():
+            self.lines.append(message(line))
+            self.timeline.append(("log", message(line)))
+
+    def delete(self, start, end):
+        del self.lines[:int(end.split(".")[0]) - 1]
+
+    def see(self, index):
+        pass
+
+
+class FakeVariable:
+    """Variable Tk notant chaque valeur affichée"""
+
+    def __init__(self, name, timeline):
+        self.name = name
+        self.timeline = timeline
+
+    def set(self, value):
+        self.timeline.append((self.name, value))
+
+
+@pytest.fixture
+def window():
+    """Fenêtre sans Tk ; applied : lignes affichées et appels, dans l'ordre où ils s'appliquent"""
+    window = object.__new__(app.MatomoARKExtractor)
+    window.applied = []
+    window.events = queue.SimpleQueue()
+    window.progress_value = FakeVariable("progress", window.applied)
+    window.status_text = FakeVariable("status", window.applied)
+    window.log_line_count = 0
+    window.log_textbox = FakeTextbox(window.applied)
+    window.after = lambda delay, func: None
+    return window
+
+
+def test_logs_and_calls_applied_in_emission_order(window):
+    window.log("Lecture", "INFO")
+    window.log("Extraction terminée", "SUCCESS")
+    window.call_in_ui(window.applied.append, ("call", "finished"))
+    window.log("Après la fin", "INFO")
+    window.call_in_ui(window.applied.append, ("call", "messagebox"))
+    window.drain_events()
+    assert window.applied == [
+        ("log", "Lecture"),
+        ("log", "Extraction terminée"),
+        ("call", "finished"),
+        ("log", "Après la fin"),
+        ("call", "messagebox"),
+    ]
+
+
+def test_log_capped_without_dropping_lines_before_a_call(window, monkeypatch):
+    monkeypatch.setattr(app, "LOG_MAX_LINES", 3)
+    window.log("avant l'appel", "INFO")
+    window.call_in_ui(window.applied.append, ("call", "finished"))
+    for i in range(5):
+        window.log(f"rafale {i}", "INFO")
+    window.drain_events()
+    # La ligne émise avant l'appel est affichée avant lui ; de la rafale, seules les 3 dernières
+    assert window.applied == [("log", "avant l'appel"), ("call", "finished"),
+                              ("log", "rafale 2"), ("log", "rafale 3"), ("log", "rafale 4")]
+    assert window.log_textbox.lines == ["rafale 2", "rafale 3", "rafale 4"]
+    assert window.log_line_count == 3
+
+
+def test_progress_coalesced_between_calls(window):
+    window.set_progress(0.2, "Lecture")
+    window.set_progress(0.5, "Métadonnées")
+    window.call_in_ui(window.applied.append, ("call", "finished"))
+    window.set_progress(0.9, "Export")
+    window.set_progress(1.0, "Terminé !")
+    window.drain_events()
+    # Dernier avancement avant l'appel, puis dernier avancement émis : rien n'est perdu
+    assert window.applied == [
+        ("progress", 0.5), ("status", "Métadonnées"),
+        ("call", "finished"),
+        ("progress", 1.0), ("status", "Terminé !"),
+    ]
+
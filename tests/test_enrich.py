@@ -0,0 +1,265 @@
+import time
+import threading
+import dataclasses
+
+import pytest
+
+from benchmarks.oai_stub import StubOAIServer
+from matomo_ark import oai
+from matomo_ark.classify import classify_ark
+from matomo_ark.oai import (
+    OAI_STATUS_OK, OAI_STATUS_ABSENT, OAI_STATUS_ERROR, EnrichmentBudget, OAICache, OAIHttpClient, enrich_notices,
+    list_metadata_formats,
+)
+from matomo_ark.parsing import Notice, Component
+
+# Notices bibliographiques (oai_dc), fonds iconographiques (inmedia) et ARK qu'aucun format ne décrit
+ARK_IDS = ([f"pf{i:010d}" for i in range(40)] + [f"FRCGM-{751000000 + i}-{i:03d}" for i in range(12)]
+           + [f"ZZ{i:06d}" for i in range(4)])
+SUMMARY_PREFIXES = ("Titres récupérés", "Non trouvés", "Erreurs/Sans métadonnées")
+
+
+class FlakyStubOAIServer(StubOAIServer):
+    """Chaque URL répond une première fois HTTP 503 (échec passager), puis normalement"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.seen = set()
+
+    def respond(self, path):
+        with self.lock:
+            first = path not in self.seen
+            self.seen.add(path)
+            if first:
+                self.errors += 1
+        if first:
+            return 503, b"Service Unavailable"
+        return super().respond(path)
+
+
+def make_notices():
+    notices = []
+    for rank, ark_id in enumerate(ARK_IDS):
+        info = classify_ark("73873", ark_id)
+        notices.append(Notice(ark=info.ark, ark_id=ark_id, naan=info.naan, url=info.url, type=info.notice_type,
+                              nb_visits=len(ARK_IDS) - rank))
+    return notices
+
+
+def enrich(server, max_workers, **kwargs):
+    """Notices enrichies, composantes, compteurs et lignes du journal"""
+    notices = make_notices()
+    components = [Component(ark_notice=notices[0].ark, component_id="BAP0001", url="")]
+    lines = []
+    stats = enrich_notices(notices, components, log=lambda message, level="INFO": lines.append(message),
+                           base_url=server.url, max_workers=max_workers, requests_per_second=1000, **kwargs)
+    return notices, components, stats, lines
+
+
+def summary(lines):
+    return [line for line in lines if line.startswith(SUMMARY_PREFIXES)]
+
+
+def counts(stats):
+    return {key: stats[key] for key in ("titles", "absent", "errors", "deferred", "coverage_pct")}
+
+
+@pytest.fixture
+def stub():
+    with StubOAIServer(absent_rate=0.2) as server:
+        yield server
+
+
+@pytest.fixture
+def sequential(stub):
+    """Référence : une requête à la fois"""
+    return enrich(stub, max_workers=1)
+
+
+def test_concurrent_matches_sequential(stub, sequential):
+    notices, components, stats, lines = enrich(stub, max_workers=8)
+    ref_notices, ref_components, ref_stats, ref_lines = sequential
+    assert [dataclasses.astuple(n) for n in notices] == [dataclasses.astuple(n) for n in ref_notices]
+    assert components == ref_components
+    assert counts(stats) == counts(ref_stats)
+    assert summary(lines) == summary(ref_lines)
+
+
+def test_statuses_and_summary(stub, sequential):
+    notices, components, stats, lines = sequential
+    absent = {ark_id for ark_id in ARK_IDS if stub.is_absent(ark_id)}
+    assert absent and not absent.issuperset(ARK_IDS[:40])  # Des notices absentes et des notices trouvées
+    by_id = {n.ark_id: n for n in notices}
+
+    for ark_id, notice in by_id.items():
+        if ark_id in absent:
+            assert (notice.statut_oai, notice.titre) == (OAI_STATUS_ABSENT, "")
+        elif ark_id.startswith("ZZ"):
+            assert (notice.statut_oai, notice.titre) == (OAI_STATUS_ERROR, "")  # cannotDisseminateFormat partout
+        else:
+            assert notice.statut_oai == OAI_STATUS_OK and notice.titre
+
+    pf = by_id["pf0000000001"] if "pf0000000001" not in absent else by_id["pf0000000002"]
+    assert pf.titre == f"Titre de la notice {pf.ark_id}"
+    assert (pf.auteur, pf.date, pf.cote) == ("Hugo, Victor (1802-1885)", "1862", f"COTE {pf.ark_id[-6:]}")
+    assert pf.type_oai == "Texte imprimé | monographie"
+    assert len(pf.description) == 300  # Description tronquée
+    fonds = next(n for n in notices if n.ark_id.startswith("FRCGM") and n.ark_id not in absent)
+    assert (fonds.titre, fonds.auteur) == (f"Fonds iconographique {fonds.ark_id}", "Atget, Eugène")
+
+    errors = sum(1 for ark_id in ARK_IDS if ark_id.startswith("ZZ") and ark_id not in absent)
+    titles = len(ARK_IDS) - len(absent) - errors
+    assert counts(stats) == {"titles": titles, "absent": len(absent), "errors": errors, "deferred": 0,
+                             "coverage_pct": 100.0}
+    assert summary(lines) == [f"Titres récupérés: {titles} / {len(ARK_IDS)}", f"Non trouvés dans OAI: {len(absent)}",
+                              f"Erreurs/Sans métadonnées: {errors}"]
+    # Titre de la notice reporté sur sa composante
+    assert components[0].titre_notice == notices[0].titre
+
+
+def test_transient_errors_retried(monkeypatch, sequential):
+    monkeypatch.setattr(oai, "OAI_RETRY_AFTER_MAX", 0.0)  # Retry-After: 1 ramené à 0 s
+    with FlakyStubOAIServer(absent_rate=0.2) as server:
+        notices, _, stats, lines = enrich(server, max_workers=4)
+    ref_notices, _, ref_stats, ref_lines = sequential
+    assert stats["retried"] == server.errors > len(ARK_IDS)
+    assert stats["gave_up"] == 0
+    assert [dataclasses.astuple(n) for n in notices] == [dataclasses.astuple(n) for n in ref_notices]
+    assert counts(stats) == counts(ref_stats)
+    assert summary(lines) == summary(ref_lines)
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self, cancel=None):
+        self.acquired += 1
+        return True
+
+
+def test_metadata_formats_cached_per_endpoint(stub, tmp_path):
+    cache = OAICache(str(tmp_path / "oai_cache.sqlite3"))
+    client = OAIHttpClient(pool_size=1)
+    limiter = CountingLimiter()
+    try:
+        expected = {"oai_dc_syracuse", "oai_dc", "inmedia"}
+        assert list_metadata_formats(client, stub.url, cache, limiter) == expected
+        assert (limiter.acquired, stub.requests) == (1, 1)  # Sous le seau à jetons comme GetRecord
+        # Relu dans sa propre table, sans compter parmi les réponses GetRecord
+        assert list_metadata_formats(client, stub.url, cache, limiter) == expected
+        assert (limiter.acquired, stub.requests) == (1, 1)
+        assert (cache.hits, cache.misses) == (0, 0)
+        assert cache.conn.execute("SELECT COUNT(*) FROM records").fetchone() == (0,)
+    finally:
+        client.close()
+        cache.close()
+
+
+class DownStubOAIServer(StubOAIServer):
+    """Catalogue en panne : chaque GetRecord répond HTTP 503 (Retry-After: 1)"""
+
+    def respond(self, path):
+        if "verb=GetRecord" in path:
+            with self.lock:
+                self.errors += 1
+            return 503, b"Service Unavailable"
+        return super().respond(path)
+
+
+class ClosingOAICache(OAICache):
+    """Cache qui note les accès reçus après sa fermeture"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.closed = False
+        self.late_accesses = []
+
+    def get(self, identifier, prefix):
+        if self.closed:
+            self.late_accesses.append(("get", identifier))
+            return None
+        return super().get(identifier, prefix)
+
+    def get_harvested(self, identifier, prefixes):
+        if self.closed:
+            self.late_accesses.append(("get_harvested", identifier))
+            return None
+        return super().get_harvested(identifier, prefixes)
+
+    def put(self, identifier, prefix, status, metadata):
+        if self.closed:
+            self.late_accesses.append(("put", identifier))
+            return
+        super().put(identifier, prefix, status, metadata)
+
+    def close(self):
+        self.closed = True
+        super().close()
+
+
+def test_cancel_leaves_no_cache_access_after_return(tmp_path):
+    cache = ClosingOAICache(str(tmp_path / "oai_cache.sqlite3"))
+    cancel = threading.Event()
+    with StubOAIServer(latency=0.2, absent_rate=0.0) as server:
+        timer = threading.Timer(1.0, cancel.set)  # Annulation pendant des requêtes en cours
+        timer.start()
+        notices, _, stats, lines = enrich(server, max_workers=4, cache=cache, cancel=cancel)
+        timer.join()
+        cache.close()
+        time.sleep(0.4)  # Laisser aux éventuelles requêtes restantes le temps d'aboutir
+    assert cache.late_accesses == []
+    assert any(line.startswith("Enrichissement annulé") for line in lines)
+    assert 0 < stats["titles"] < len(ARK_IDS)
+    # Seules les réponses traitées avant l'annulation sont retenues
+    assert sum(1 for n in notices if n.statut_oai == OAI_STATUS_OK) == stats["titles"]
+
+
+def test_cancel_interrupts_retry_and_breaker_pauses():
+    cancel = threading.Event()
+    cancelled_at = []
+
+    def stop():
+        cancelled_at.append(time.monotonic())
+        cancel.set()
+
+    with DownStubOAIServer() as server:
+        # Après 3 s : attentes Retry-After en cours et disjoncteur ouvert (5 s de suspension)
+        timer = threading.Timer(3.0, stop)
+        timer.start()
+        _, _, stats, lines = enrich(server, max_workers=4, cancel=cancel)
+        returned_at = time.monotonic()
+        timer.join()
+    assert stats["breaker_trips"] >= 1
+    assert returned_at - cancelled_at[0] < 1.0
+    assert any(line.startswith("Enrichissement annulé") for line in lines)
+    assert stats["titles"] == 0
+
+
+def test_warm_run_does_not_recount_prefix_stats(stub, tmp_path):
+    cache = OAICache(str(tmp_path / "oai_cache.sqlite3"))
+    try:
+        enrich(stub, max_workers=4, cache=cache, store=cache)
+        learned = cache.load_prefix_stats()
+        requests = stub.requests
+        # Seconde exécution servie par le cache : seules les réponses du catalogue (formats
+        # essayés dans l'ordre appris, jamais demandés la première fois) s'ajoutent
+        _, _, stats, _ = enrich(stub, max_workers=4, cache=cache, store=cache)
+        assert stats["cache_hits"] > 0
+        relearned = cache.load_prefix_stats()
+        new_answers = sum(map(sum, relearned.values())) - sum(map(sum, learned.values()))
+        assert new_answers == stub.requests - requests
+    finally:
+        cache.close()
+
+
+def test_budget_plan_by_coverage():
+    notices = make_notices()  # 56 à 1 visites, par visites décroissantes
+    total = sum(n.nb_visits for n in notices)
+    count = EnrichmentBudget(coverage=0.5).plan(notices)
+    assert sum(n.nb_visits for n in notices[:count - 1]) < total * 0.5 <= sum(n.nb_visits for n in notices[:count])
+    assert EnrichmentBudget(coverage=0.5, max_notices=3).plan(notices) == 3
+    # Aucune visite comptée : la couverture ne coupe rien, toutes les notices sont demandées
+    for notice in notices:
+        notice.nb_visits = 0
+    assert EnrichmentBudget(coverage=0.95).plan(notices) == len(notices)
@@ -0,0 +1,101 @@
+import openpyxl
+import pytest
+
+from matomo_ark.export import HEADERS, HEADERS4, generate_excel
+from matomo_ark.oai import OAI_STATUS_OK, OAI_STATUS_ABSENT, OAI_STATUS_DEFERRED, propagate_titles
+from matomo_ark.parsing import parse_xml
+
+
+@pytest.fixture
+def workbook(export_path, tmp_path):
+    """Classeur écrit (mode write-only) puis relu, avec ses notices et composantes"""
+    notices, components = parse_xml(export_path)
+    statuses = [OAI_STATUS_OK, OAI_STATUS_ABSENT, OAI_STATUS_DEFERRED, OAI_STATUS_OK, '']
+    for notice, status in zip(notices, statuses):
+        notice.statut_oai = status
+    notices[0].titre, notices[0].auteur = "Rue de la Montagne-Sainte-Geneviève", "Atget, Eugène"
+    notices[3].titre = "Les Misérables"
+    propagate_titles(notices, components)
+    path = generate_excel(notices, components, tmp_path / "stats.xlsx", source_name="export_matomo.xml")
+    return openpyxl.load_workbook(path), notices, components
+
+
+def test_sheets(workbook):
+    wb, _, _ = workbook
+    assert wb.sheetnames == ["Statistiques ARK", "Résumé", "Top 20", "Composantes"]
+
+
+def test_main_sheet(workbook):
+    wb, notices, _ = workbook
+    ws = wb["Statistiques ARK"]
+    rows = list(ws.iter_rows(values_only=True))
+    assert list(rows[0]) == HEADERS
+    assert len(HEADERS) == 28 and ws.cell(1, 28).value == "Statut OAI"
+    assert len(rows) == len(notices) + 1
+    assert ws.freeze_panes == "E2"
+    assert ws.auto_filter.ref == f"A1:AB{len(notices) + 1}"
+
+    first = rows[1]
+    assert first[:5] == (1, "ark:/73873/FRCGM-751000001-001", "FRCGM-751000001-001", "Fonds iconographique",
+                         "Rue de la Montagne-Sainte-Geneviève")
+    # Statistiques Matomo (colonnes 18 à 27), en nombres
+    assert first[17:27] == (25, 20, 40, 400, "00:00:10", "30 %", "40 %", 0, 0,
+                            "https://bibliotheques-specialisees.paris.fr/ark:/73873/FRCGM-751000001-001")
+    assert ws.cell(2, 27).hyperlink.target == first[26]
+    # Rang et statut OAI de chaque notice, dans l'ordre du classement
+    assert [(row[0], row[2], row[27]) for row in rows[1:]] == [
+        (i, notice.ark_id, notice.statut_oai or None) for i, notice in enumerate(notices, 1)
+    ]
+
+
+def test_summary_sheet(workbook):
+    wb, notices, _ = workbook
+    rows = [row for row in wb["Résumé"].iter_rows(values_only=True)]
+    assert rows[0][0] == "📊 Résumé des statistiques"
+    assert rows[3][:2] == ("Fichier source:", "export_matomo.xml")
+    assert rows[4][:2] == ("Méthode métadonnées:", "API OAI-PMH")
+    assert [row[:2] for row in rows[6:12]] == [
+        ("Statistiques globales", None),
+        ("Nombre de notices ARK:", 5),
+        ("Notices avec titre:", 2),
+        ("Notices différées (à compléter):", 1),
+        ("Total des visites:", sum(n.nb_visits for n in notices)),
+        ("Total des pages vues:", sum(n.nb_hits for n in notices)),
+    ]
+    assert rows[13][0] == "Par type de ressource"
+    assert rows[14][:4] == ("Type", "Notices", "Avec titre", "Visites")
+    assert [row[:4] for row in rows[15:]] == [
+        ("Notice bibliographique", 4, 1, 67),
+        ("Fonds iconographique", 1, 1, 25),
+    ]
+
+
+def test_top_20_sheet(workbook):
+    wb, notices, _ = workbook
+    rows = list(wb["Top 20"].iter_rows(values_only=True))
+    assert rows[0][0] == "🏆 Top 20 des ressources les plus consultées"
+    assert rows[2] == ("Rang", "Titre / ARK", "Type", "Auteur", "Visites", "Pages vues")
+    assert rows[3:] == [
+        (1, "Rue de la Montagne-Sainte-Geneviève", "Fonds iconographique", "Atget, Eugène", 25, 40),
+        (2, "pf0000000002", "Notice bibliographique", None, 22, 22),  # Sans titre : l'identifiant ARK
+        (3, "pf0000000000", "Notice bibliographique", None, 22, 25),
+        (4, "Les Misérables", "Notice bibliographique", None, 18, 31),
+        (5, "pf0000000004", "Notice bibliographique", None, 5, 5),
+    ]
+
+
+def test_components_sheet(workbook):
+    wb, _, components = workbook
+    ws = wb["Composantes"]
+    rows = list(ws.iter_rows(values_only=True))
+    assert rows[1][0] == f"Total: {len(components)} composantes"
+    assert list(rows[3]) == HEADERS4
+    assert ws.freeze_panes == "A5"
+    assert ws.auto_filter.ref == f"A4:J{len(components) + 4}"
+    # Par visites décroissantes (ordre du document à égalité), titre de la notice reporté
+    assert [row[:5] for row in rows[4:]] == [
+        ("ark:/73873/pf0000000001", "Les Misérables", "BAP0001", "Archive (BAP)", 4),
+        ("ark:/73873/pf0000000001", "Les Misérables", "0002", "Page numérisée", 1),
+        ("ark:/73873/inconnu", None, "BAP0009", "Archive (BAP)", 1),
+    ]
+    assert ws.cell(5, 10).hyperlink.target == "https://bibliotheques-specialisees.paris.fr/ark:/73873/pf0000000001/BAP0001"
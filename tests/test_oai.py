@@ -0,0 +1,50 @@
+import xml.etree.ElementTree as ET
+
+from matomo_ark.oai import OAI_PMH_NS, parse_oai_response, parse_oai_element
+
+
+def test_dublin_core_fields(read_data):
+    metadata = parse_oai_response(read_data("oai_dc.xml"))
+    assert metadata == {
+        "title": "Les Misérables",  # Première valeur, espaces retirés
+        "creator": "Hugo, Victor (1802-1885)",
+        "date": "1862",
+        "publisher": "Paris : Lacroix",
+        "description": "Roman en cinq parties.",
+        "type": "Texte imprimé | monographie",  # Valeurs distinctes, dans l'ordre du document
+        "subject": "Roman | Paris (France)",
+        "identifier": "8-RES-1234 | 8-RES-1234 bis",  # Sans les URL ni les identifiants oai:
+        "source": "Bibliothèque historique de la Ville de Paris",
+        "format": "1 vol. (320 p.)",
+        "rights": "Domaine public | Consultation sur place",
+        "language": "fre",
+        "relation": "Notice du catalogue",
+        "contributor": "Brion, Gustave (1824-1877). Illustrateur",
+    }
+    # Ordre des champs : celui de OAI_DC_FIELDS (colonnes des exports)
+    assert list(metadata) == ["title", "creator", "date", "publisher", "description", "type", "subject",
+                              "identifier", "source", "format", "rights", "language", "relation", "contributor"]
+
+
+def test_inmedia_properties(read_data):
+    metadata = parse_oai_response(read_data("oai_inmedia.xml"))
+    assert metadata == {
+        "identifier": "FRCGM-751000001-001",  # L'identifiant oai: de l'en-tête est écarté, puis complété
+        "title": "Rue de la Montagne-Sainte-Geneviève",  # Nom de propriété sans casse
+        "creator": "Atget, Eugène",  # author d'abord : creator ne le remplace pas
+        "date": "1900",
+        "subject": "Rues | Paris (France) -- 5e arrondissement",
+        "source": "Musée Carnavalet",
+    }
+
+
+def test_error_and_invalid_responses(read_data):
+    assert parse_oai_response(read_data("oai_error.xml")) is None
+    assert parse_oai_response("<OAI-PMH") is None
+
+
+def test_harvested_record_parsed_like_get_record(read_data):
+    # Moissonnage ListRecords : le <record> seul donne les mêmes métadonnées
+    text = read_data("oai_dc.xml")
+    record = ET.fromstring(text).find(f".//{{{OAI_PMH_NS}}}record")
+    assert parse_oai_element(record) == parse_oai_response(text)
@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+from matomo_ark import classify, parse_cache
+from matomo_ark.parse_cache import ParseCache, cached_parse
+from matomo_ark.parsing import parse_xml
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ParseCache(str(tmp_path / "cache_lecture"))
+
+
+def test_reload_matches_parse(cache, export_path):
+    parsed = parse_xml(export_path)
+    notices, components, key, hit = cached_parse([export_path], lambda: parse_xml(export_path), cache)
+    assert not hit and (notices, components) == parsed
+    notices, components, cached_key, hit = cached_parse([export_path], lambda: pytest.fail("fichier relu"), cache)
+    assert hit and cached_key == key
+    assert (notices, components) == parsed
+
+
+def test_other_rules_parse_again(cache, export_path, monkeypatch):
+    key = cache.fingerprint([export_path])
+    cache.save(key, *parse_xml(export_path))
+    # Règles de classement modifiées (nouvelle version) : la lecture en cache est écartée
+    monkeypatch.setattr(parse_cache, "PARSE_RULES_DIGEST", "autres règles")
+    assert cache.load(key) is None
+    assert not os.path.exists(cache.entry_path(key))
+
+
+def test_rules_digest_follows_classify_tables(monkeypatch):
+    assert parse_cache.rules_digest() == parse_cache.PARSE_RULES_DIGEST
+    monkeypatch.setattr(classify, "ARK_TYPE_RULES", {**classify.ARK_TYPE_RULES, 'btv1b': 'Manuscrit'})
+    assert parse_cache.rules_digest() != parse_cache.PARSE_RULES_DIGEST
@@ -0,0 +1,87 @@
+from matomo_ark.classify import SITE_URL, UNKNOWN_PARENT_ARK
+from matomo_ark.parsing import parse_xml, parse_many
+
+
+def test_notices_sorted_by_visits_then_first_row(export_path):
+    notices, _ = parse_xml(export_path)
+    # pf0000000002 et pf0000000000 sont à égalité : la première apparue dans le document l'emporte
+    assert [(n.ark_id, n.nb_visits) for n in notices] == [
+        ("FRCGM-751000001-001", 25),
+        ("pf0000000002", 22),
+        ("pf0000000000", 22),
+        ("pf0000000001", 18),
+        ("pf0000000004", 5),
+    ]
+
+
+def test_rows_aggregated_per_ark(export_path):
+    notices = {n.ark_id: n for n in parse_xml(export_path)[0]}
+
+    # Ligne de la notice, composantes BAP/pages comptées pour elle et variante ?lang=en
+    first = notices["pf0000000001"]
+    assert (first.nb_visits, first.nb_hits, first.sum_time_spent) == (18, 31, 142)
+    assert first.nb_uniq_visitors == 8  # Maximum, pas la somme
+    assert (first.entry_nb_visits, first.entry_bounce_count, first.exit_nb_visits) == (3, 1, 2)
+    # URL et taux texte de la première ligne du document
+    assert first.url == SITE_URL + "ark:/73873/pf0000000001"
+    assert (first.avg_time_on_page, first.bounce_rate, first.exit_rate) == ("00:00:05", "10 %", "20 %")
+    assert first.type == "Notice bibliographique"
+
+    # Suffixe .locale retiré de l'ARK, vue v0001 agrégée, visiteurs uniques cumulés (sum_daily)
+    locale = notices["pf0000000002"]
+    assert locale.ark == "ark:/73873/pf0000000002"
+    assert locale.nb_uniq_visitors == 12
+    assert locale.url == SITE_URL + "ark:/73873/pf0000000002.locale=fr"
+
+    # Notice désignée par son seul libellé, plus la ligne /BHP0007 dont le segment la désigne
+    label = notices["pf0000000000"]
+    assert (label.nb_visits, label.nb_hits) == (22, 25)
+    assert label.url == SITE_URL + "ark:/73873/pf0000000000"
+
+    # ARK encodé dans le segment (ligne sans URL)
+    assert notices["pf0000000004"].nb_visits == 5
+    assert notices["FRCGM-751000001-001"].type == "Fonds iconographique"
+
+
+def test_components_in_document_order_with_parent(export_path):
+    _, components = parse_xml(export_path)
+    assert [(c.ark_notice, c.component_id, c.type, c.nb_visits) for c in components] == [
+        ("ark:/73873/pf0000000001", "BAP0001", "Archive (BAP)", 4),
+        ("ark:/73873/pf0000000001", "0002", "Page numérisée", 1),
+        (UNKNOWN_PARENT_ARK, "BAP0009", "Archive (BAP)", 1),
+    ]
+    assert components[0].url == SITE_URL + "ark:/73873/pf0000000001/BAP0001"
+    assert components[2].url == ""
+
+
+def test_on_notice_called_once_per_ark_in_document_order(export_path):
+    seen = []
+    parse_xml(export_path, on_notice=lambda notice: seen.append(notice.ark_id))
+    assert seen == ["pf0000000001", "FRCGM-751000001-001", "pf0000000002", "pf0000000000", "pf0000000004"]
+
+
+def test_parse_many_merges_files_in_order(export_path, export_path_2):
+    notices, components = parse_many([export_path, export_path_2], max_workers=1)
+    merged = {n.ark_id: n for n in notices}
+    # pf0000000000 : 22 + 30 + 5 (composante) visites, visiteurs uniques au maximum, taux du premier fichier
+    assert notices[0].ark_id == "pf0000000000"
+    assert (merged["pf0000000000"].nb_visits, merged["pf0000000000"].nb_uniq_visitors) == (57, 50)
+    assert merged["pf0000000000"].avg_time_on_page == ""
+    assert notices[-1].ark_id == "pf0000000006"
+    assert [c.component_id for c in components] == ["BAP0001", "0002", "BAP0009", "BHP0007"]
+    assert components[-1].ark_notice == "ark:/73873/pf0000000000"
+
+
+def test_parse_many_single_file_matches_parse_xml(export_path):
+    assert parse_many([export_path], max_workers=1) == parse_xml(export_path)
+
+
+def test_parse_many_workers_match_sequential(export_path, export_path_2):
+    # Plus de fichiers que de processus : plusieurs suites par processus, fusionnées dans l'ordre
+    paths = [export_path, export_path_2, export_path_2, export_path, export_path_2]
+    sequential = parse_many(paths, max_workers=1)
+    seen = []
+    parallel = parse_many(paths, max_workers=3, on_notice=lambda notice: seen.append(notice.ark_id))
+    assert parallel == sequential
+    assert seen == ["pf0000000001", "FRCGM-751000001-001", "pf0000000002", "pf0000000000", "pf0000000004",
+                    "pf0000000006"]